@@ -21,6 +21,9 @@ class Settings:
     AWS_REGION: str = os.getenv("AWS_REGION", "us-east-1")
     AWS_ACCESS_KEY_ID: str = os.getenv("AWS_ACCESS_KEY_ID", "")
     AWS_SECRET_ACCESS_KEY: str = os.getenv("AWS_SECRET_ACCESS_KEY", "")
+    # Overrides the endpoint of the bedrock, bedrock-runtime and sts clients,
+    # e.g. http://127.0.0.1:4010 for tools/bedrock_stub.py
+    AWS_ENDPOINT_URL: str = os.getenv("AWS_ENDPOINT_URL", "")
 
     # Bedrock settings
     BEDROCK_MODEL_ID: str = os.getenv(
@@ -28,10 +31,109 @@ class Settings:
         "anthropic.claude-3-sonnet-20240229-v1:0"
     )
     BEDROCK_MAX_TOKENS: int = int(os.getenv("BEDROCK_MAX_TOKENS", "1000"))
+    # Upper bound on concurrent invoke_model calls per worker
+    BEDROCK_MAX_CONCURRENCY: int = int(os.getenv("BEDROCK_MAX_CONCURRENCY", "8"))
+
+    # Adaptive client-side rate limiting (requests/second) and retries
+    BEDROCK_RATE_LIMIT_INITIAL: float = float(os.getenv("BEDROCK_RATE_LIMIT_INITIAL", "5"))
+    BEDROCK_RATE_LIMIT_MIN: float = float(os.getenv("BEDROCK_RATE_LIMIT_MIN", "0.5"))
+    BEDROCK_RATE_LIMIT_MAX: float = float(os.getenv("BEDROCK_RATE_LIMIT_MAX", "50"))
+    BEDROCK_RATE_LIMIT_BURST: int = int(os.getenv("BEDROCK_RATE_LIMIT_BURST", "5"))
+    BEDROCK_RATE_LIMIT_INCREASE: float = float(os.getenv("BEDROCK_RATE_LIMIT_INCREASE", "0.5"))
+    BEDROCK_RATE_LIMIT_DECREASE: float = float(os.getenv("BEDROCK_RATE_LIMIT_DECREASE", "0.5"))
+    BEDROCK_MAX_RETRIES: int = int(os.getenv("BEDROCK_MAX_RETRIES", "4"))
+    BEDROCK_RETRY_BASE_DELAY: float = float(os.getenv("BEDROCK_RETRY_BASE_DELAY", "0.25"))
+    BEDROCK_RETRY_MAX_DELAY: float = float(os.getenv("BEDROCK_RETRY_MAX_DELAY", "8"))
+    BEDROCK_REQUEST_DEADLINE_SECONDS: float = float(os.getenv("BEDROCK_REQUEST_DEADLINE_SECONDS", "60"))
+
+    # HTTP connection pool of the bedrock-runtime clients, one pool per region and worker;
+    # 0 sizes it to BEDROCK_MAX_CONCURRENCY so every executor thread can hold a connection
+    BEDROCK_POOL_CONNECTIONS: int = int(os.getenv("BEDROCK_POOL_CONNECTIONS", "0"))
+    BEDROCK_TCP_KEEPALIVE: bool = os.getenv("BEDROCK_TCP_KEEPALIVE", "True").lower() == "true"
+    BEDROCK_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("BEDROCK_CONNECT_TIMEOUT_SECONDS", "5"))
+    # Longest wait for the next bytes of a response, including between streamed chunks
+    BEDROCK_READ_TIMEOUT_SECONDS: float = float(os.getenv("BEDROCK_READ_TIMEOUT_SECONDS", "60"))
+    # botocore's own retries (legacy, standard or adaptive) inside each attempt of the
+    # failover loop above; 1 attempt leaves retrying to the loop and its rate limiters
+    BEDROCK_SDK_RETRY_MODE: str = os.getenv("BEDROCK_SDK_RETRY_MODE", "standard")
+    BEDROCK_SDK_MAX_ATTEMPTS: int = int(os.getenv("BEDROCK_SDK_MAX_ATTEMPTS", "1"))
+
+    # Endpoint pool, comma separated region=model_id pairs, e.g.
+    # "us-east-1=anthropic.claude-3-sonnet-20240229-v1:0,us-west-2=anthropic.claude-3-haiku-20240307-v1:0"
+    # Empty means a single endpoint: AWS_REGION=BEDROCK_MODEL_ID
+    BEDROCK_ENDPOINTS: str = os.getenv("BEDROCK_ENDPOINTS", "")
+    # Cooldown after a failed call, doubled for every consecutive failure up to the max
+    BEDROCK_ENDPOINT_COOLDOWN_SECONDS: float = float(os.getenv("BEDROCK_ENDPOINT_COOLDOWN_SECONDS", "5"))
+    BEDROCK_ENDPOINT_MAX_COOLDOWN_SECONDS: float = float(os.getenv("BEDROCK_ENDPOINT_MAX_COOLDOWN_SECONDS", "60"))
+
+    # Circuit breaker around Bedrock calls: opens when, over the last WINDOW calls (at
+    # least MIN_CALLS), the failure share reaches ERROR_RATE or the share of calls slower
+    # than SLOW_CALL_SECONDS reaches SLOW_CALL_RATE, then fails fast for OPEN_SECONDS
+    BEDROCK_BREAKER_ENABLED: bool = os.getenv("BEDROCK_BREAKER_ENABLED", "True").lower() == "true"
+    BEDROCK_BREAKER_WINDOW: int = int(os.getenv("BEDROCK_BREAKER_WINDOW", "20"))
+    BEDROCK_BREAKER_MIN_CALLS: int = int(os.getenv("BEDROCK_BREAKER_MIN_CALLS", "10"))
+    BEDROCK_BREAKER_ERROR_RATE: float = float(os.getenv("BEDROCK_BREAKER_ERROR_RATE", "0.5"))
+    BEDROCK_BREAKER_SLOW_CALL_SECONDS: float = float(os.getenv("BEDROCK_BREAKER_SLOW_CALL_SECONDS", "30"))
+    BEDROCK_BREAKER_SLOW_CALL_RATE: float = float(os.getenv("BEDROCK_BREAKER_SLOW_CALL_RATE", "0.8"))
+    BEDROCK_BREAKER_OPEN_SECONDS: float = float(os.getenv("BEDROCK_BREAKER_OPEN_SECONDS", "30"))
+    BEDROCK_BREAKER_HALF_OPEN_CALLS: int = int(os.getenv("BEDROCK_BREAKER_HALF_OPEN_CALLS", "2"))
+    # Serve an expired cached analysis (kept for ANALYSIS_CACHE_STALE_SECONDS) when Bedrock is unavailable
+    BEDROCK_STALE_FALLBACK: bool = os.getenv("BEDROCK_STALE_FALLBACK", "False").lower() == "true"
+
+    # Admission control of the analyze, stream and batch routes: at most MAX_IN_FLIGHT
+    # requests per worker run at once, up to MAX_QUEUE more wait their turn for at most
+    # QUEUE_TIMEOUT_SECONDS, the rest get 503 with Retry-After. 0 in flight disables it
+    ADMISSION_MAX_IN_FLIGHT: int = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "16"))
+    ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "10"))
+
+    # Batch analysis settings
+    BEDROCK_BATCH_CONCURRENCY: int = int(os.getenv("BEDROCK_BATCH_CONCURRENCY", "4"))
+    BEDROCK_BATCH_MAX_ITEMS: int = int(os.getenv("BEDROCK_BATCH_MAX_ITEMS", "50"))
+    # Directory that relative Product.image paths are resolved against
+    PRODUCT_IMAGE_ROOT: str = os.getenv("PRODUCT_IMAGE_ROOT", "app/static")
+
+    # Analysis cache settings
+    ANALYSIS_CACHE_ENABLED: bool = os.getenv("ANALYSIS_CACHE_ENABLED", "True").lower() == "true"
+    ANALYSIS_CACHE_MAX_ENTRIES: int = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "256"))
+    ANALYSIS_CACHE_TTL_SECONDS: int = int(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", "86400"))  # 0 disables expiry
+    ANALYSIS_CACHE_DB_MAX_ENTRIES: int = int(os.getenv("ANALYSIS_CACHE_DB_MAX_ENTRIES", "10000"))
+    # Expired entries are kept this much longer for BEDROCK_STALE_FALLBACK
+    ANALYSIS_CACHE_STALE_SECONDS: int = int(os.getenv("ANALYSIS_CACHE_STALE_SECONDS", "0"))
+
+    # Image preprocessing settings
+    IMAGE_PREPROCESSING_ENABLED: bool = os.getenv("IMAGE_PREPROCESSING_ENABLED", "True").lower() == "true"
+    # Claude gains nothing from images above ~1568px on the long edge or ~1.15 megapixels
+    IMAGE_MAX_DIMENSION: int = int(os.getenv("IMAGE_MAX_DIMENSION", "1568"))
+    IMAGE_MAX_PIXELS: int = int(os.getenv("IMAGE_MAX_PIXELS", "1150000"))
+    IMAGE_OUTPUT_FORMAT: str = os.getenv("IMAGE_OUTPUT_FORMAT", "JPEG")  # JPEG, WEBP or PNG
+    IMAGE_OUTPUT_QUALITY: int = int(os.getenv("IMAGE_OUTPUT_QUALITY", "85"))
+
+    # Token usage metering
+    USAGE_METERING_ENABLED: bool = os.getenv("USAGE_METERING_ENABLED", "True").lower() == "true"
+    # USD per 1,000 tokens as JSON, overriding the built-in Claude 3 prices, e.g.
+    # {"anthropic.claude-3-haiku-20240307-v1:0": {"input": 0.00025, "output": 0.00125}}
+    BEDROCK_MODEL_PRICES: str = os.getenv("BEDROCK_MODEL_PRICES", "")
+
+    # Background health probing of credentials, Bedrock and the database
+    HEALTH_CHECK_INTERVAL_SECONDS: float = float(os.getenv("HEALTH_CHECK_INTERVAL_SECONDS", "30"))
+    HEALTH_CHECK_TIMEOUT_SECONDS: float = float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", "10"))
+
+    # Asynchronous analysis jobs
+    ANALYSIS_JOB_WORKERS: int = int(os.getenv("ANALYSIS_JOB_WORKERS", "2"))
+    # Attempts for jobs failing with 429 or 5xx before they are marked failed
+    ANALYSIS_JOB_MAX_ATTEMPTS: int = int(os.getenv("ANALYSIS_JOB_MAX_ATTEMPTS", "3"))
+    ANALYSIS_JOB_RETRY_DELAY_SECONDS: float = float(os.getenv("ANALYSIS_JOB_RETRY_DELAY_SECONDS", "5"))
+    # Finished jobs are deleted after this many hours, 0 keeps them forever
+    ANALYSIS_JOB_RETENTION_HOURS: int = int(os.getenv("ANALYSIS_JOB_RETENTION_HOURS", "24"))
 
     # File upload settings
     MAX_FILE_SIZE_MB: int = int(os.getenv("MAX_FILE_SIZE_MB", "5"))
     MAX_FILE_SIZE_BYTES: int = MAX_FILE_SIZE_MB * 1024 * 1024
+    # Uploads are read this many bytes at a time
+    UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", str(64 * 1024)))
+    # Body limit of routes that do not take file uploads
+    MAX_REQUEST_BODY_BYTES: int = int(os.getenv("MAX_REQUEST_BODY_BYTES", str(1024 * 1024)))
     ALLOWED_EXTENSIONS: List[str] = [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"]
     ALLOWED_CONTENT_TYPES: List[str] = [
         "image/jpeg", "image/png", "image/gif",
@@ -1,23 +1,44 @@
+import asyncio
+import json
 import os
-from typing import Optional
-from fastapi import HTTPException, UploadFile
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+from fastapi import HTTPException, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
 
-from app.dto.schema import ImageAnalysisResponse
-from app.services.bedrock import bedrock_service
+from app.dto.schema import ImageAnalysisResponse, BatchAnalysisItem, BatchAnalysisResponse, AnalysisJobResponse
+from app.database.models import AnalysisJob
+from app.services.bedrock import bedrock_service, AnalysisResult, TokenUsage
+from app.services.usage_meter import usage_meter
+from app.services.health_monitor import health_monitor
+from app.services.job_queue import job_queue, FINISHED_STATUSES
+from app.services.admission_controller import admission_controller
+from app.services.image_preprocessing import detect_image_type, SIGNATURE_LENGTH
+from app.controllers.products_controller import products_controller
 from app.config.settings import settings
 
 #TODO: remove - simple bedrock usage example
 class ImageController:
     """Controller for handling image analysis business logic"""
 
+    # Seconds between job re-reads while waiting, covers jobs run by other processes
+    JOB_POLL_INTERVAL = 2.0
+
     def __init__(self):
         self.bedrock_service = bedrock_service
+        self.usage_meter = usage_meter
+        self.health_monitor = health_monitor
+        self.job_queue = job_queue
+        self.admission_controller = admission_controller
         self.settings = settings
+        self.client_disconnects = 0
 
     async def analyze_uploaded_image(
             self,
             file: UploadFile,
-            prompt: Optional[str] = None
+            prompt: Optional[str] = None,
+            model_family: Optional[str] = None,
+            request: Optional[Request] = None
     ) -> ImageAnalysisResponse:
         """
         Analyze an uploaded image file
@@ -25,6 +46,8 @@ class ImageController:
         Args:
             file: Uploaded image file
             prompt: Custom analysis prompt
+            model_family: Optional model family (e.g. haiku, sonnet) to pin the request to
+            request: HTTP request, the analysis is cancelled if its client disconnects
 
         Returns:
             ImageAnalysisResponse with analysis results
@@ -39,17 +62,463 @@ class ImageController:
         analysis_prompt = prompt or self.settings.DEFAULT_ANALYSIS_PROMPT
 
         # Perform analysis
-        analysis, processing_time = self.bedrock_service.analyze_image(
-            image_data, analysis_prompt
+        result = await self._cancel_on_disconnect(request, self.bedrock_service.analyze_image(
+            image_data, analysis_prompt, model_family
+        ))
+        await self._record_usage(
+            "analyze", analysis_prompt, len(image_data), result.model_id, result.usage, result.cached
         )
 
+        return self._build_response(result, len(image_data))
+
+    async def _cancel_on_disconnect(self, request: Optional[Request], work: Awaitable):
+        """
+        Await work, cancelling it if the HTTP client disconnects first
+
+        Runs after the request body has been read, so the next ASGI message
+        is http.disconnect. Cancellation reaches the Bedrock call, which drops
+        executor work that has not started and closes open response streams.
+        """
+        if request is None:
+            return await work
+
+        task = asyncio.ensure_future(work)
+        watcher = asyncio.create_task(self._wait_for_disconnect(request))
+        try:
+            await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            watcher.cancel()
+            if not task.done():
+                task.cancel()
+
+        if task.done():
+            return task.result()
+        # Let the cancellation run through before answering
+        await asyncio.wait({task})
+        self.client_disconnects += 1
+        # nginx's code for a request the client gave up on, nobody reads the response
+        raise HTTPException(status_code=499, detail="Client closed request")
+
+    @staticmethod
+    async def _wait_for_disconnect(request: Request) -> None:
+        while (await request.receive())["type"] != "http.disconnect":
+            pass
+
+    def _build_response(self, result: AnalysisResult, image_size: int) -> ImageAnalysisResponse:
+        """Convert a service result into the API response model"""
         return ImageAnalysisResponse(
-            analysis=analysis,
-            model_used=self._get_model_display_name(),
-            image_size=f"{len(image_data)} bytes",
-            processing_time=round(processing_time, 2)
+            analysis=result.analysis,
+            model_used=self._get_model_display_name(result.model_id),
+            image_size=f"{image_size} bytes",
+            processing_time=round(result.processing_time, 2),
+            cached=result.cached,
+            stale=result.stale,
+            original_processing_time=(
+                round(result.original_processing_time, 2)
+                if result.original_processing_time is not None else None
+            ),
+            input_tokens=result.usage.input_tokens,
+            output_tokens=result.usage.output_tokens,
+            cost=round(self.usage_meter.cost(
+                result.model_id, result.usage.input_tokens, result.usage.output_tokens
+            ), 6)
+        )
+
+    async def _record_usage(
+            self,
+            route: str,
+            prompt: str,
+            image_size: int,
+            model_id: Optional[str],
+            usage: TokenUsage,
+            cached: bool
+    ) -> None:
+        """Add an analysis to the per-route, per-day usage aggregates"""
+        await run_in_threadpool(
+            self.usage_meter.record,
+            route=route,
+            model_id=model_id,
+            prompt=prompt,
+            image_size=image_size,
+            input_tokens=usage.input_tokens,
+            output_tokens=usage.output_tokens,
+            cached=cached
+        )
+
+    async def analyze_batch(
+            self,
+            db: Session,
+            files: Optional[List[UploadFile]] = None,
+            product_ids: Optional[List[int]] = None,
+            prompt: Optional[str] = None,
+            model_family: Optional[str] = None
+    ) -> AsyncIterator[BatchAnalysisItem]:
+        """
+        Analyze many images with bounded concurrency
+
+        Uploads are read and products looked up before returning, the
+        analyses themselves run BEDROCK_BATCH_CONCURRENCY at a time. A failing
+        item is reported in its own result and never aborts the batch.
+
+        Args:
+            db: Database session used to resolve product images
+            files: Uploaded image files
+            product_ids: Products whose local image file should be analyzed
+            prompt: Custom analysis prompt, shared by all items
+            model_family: Optional model family to pin every item to
+
+        Returns:
+            Async iterator of per-item results in completion order
+        """
+        files = files or []
+        product_ids = product_ids or []
+
+        total = len(files) + len(product_ids)
+        if total == 0:
+            raise HTTPException(status_code=400, detail="Provide at least one file or product ID")
+        if total > self.settings.BEDROCK_BATCH_MAX_ITEMS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Too many items. Maximum batch size is {self.settings.BEDROCK_BATCH_MAX_ITEMS}"
+            )
+
+        analysis_prompt = prompt or self.settings.DEFAULT_ANALYSIS_PROMPT
+        family = self.bedrock_service.validate_model_family(model_family)
+        items = []
+
+        for file in files:
+            item = BatchAnalysisItem(index=len(items), source="file", filename=file.filename, status="pending")
+            try:
+                self._validate_file(file)
+                image_data = await self._read_file_data(file)
+                items.append((item, self._loaded(image_data)))
+            except HTTPException as e:
+                items.append((item, self._failed(e)))
+
+        products = {}
+        if product_ids:
+            found = await run_in_threadpool(
+                products_controller.get_products_by_ids, db=db, product_ids=product_ids
+            )
+            products = {product.id: product.image for product in found}
+
+        for product_id in product_ids:
+            item = BatchAnalysisItem(index=len(items), source="product", product_id=product_id, status="pending")
+            if product_id not in products:
+                items.append((item, self._failed(HTTPException(status_code=404, detail="Product not found"))))
+            else:
+                items.append((item, self._product_image_loader(products[product_id])))
+
+        semaphore = asyncio.Semaphore(self.settings.BEDROCK_BATCH_CONCURRENCY)
+        return self._run_batch(items, analysis_prompt, family, semaphore)
+
+    async def _run_batch(
+            self,
+            items: list,
+            prompt: str,
+            model_family: Optional[str],
+            semaphore: asyncio.Semaphore
+    ) -> AsyncIterator[BatchAnalysisItem]:
+        tasks = [
+            asyncio.create_task(self._analyze_batch_item(item, load, prompt, model_family, semaphore))
+            for item, load in items
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _analyze_batch_item(
+            self,
+            item: BatchAnalysisItem,
+            load: Callable[[], Awaitable[bytes]],
+            prompt: str,
+            model_family: Optional[str],
+            semaphore: asyncio.Semaphore
+    ) -> BatchAnalysisItem:
+        async with semaphore:
+            try:
+                image_data = await load()
+                result = await self.bedrock_service.analyze_image(image_data, prompt, model_family)
+                await self._record_usage(
+                    "analyze/batch", prompt, len(image_data), result.model_id, result.usage, result.cached
+                )
+                item.result = self._build_response(result, len(image_data))
+                item.status = "ok"
+            except HTTPException as e:
+                item.status = "error"
+                item.error = str(e.detail)
+                item.status_code = e.status_code
+            except Exception as e:
+                item.status = "error"
+                item.error = f"Unexpected error: {str(e)}"
+                item.status_code = 500
+        return item
+
+    @staticmethod
+    def _loaded(image_data: bytes) -> Callable[[], Awaitable[bytes]]:
+        async def load() -> bytes:
+            return image_data
+        return load
+
+    @staticmethod
+    def _failed(error: HTTPException) -> Callable[[], Awaitable[bytes]]:
+        async def load() -> bytes:
+            raise error
+        return load
+
+    def _product_image_loader(self, image: Optional[str]) -> Callable[[], Awaitable[bytes]]:
+        async def load() -> bytes:
+            return await run_in_threadpool(self._read_product_image, image)
+        return load
+
+    def _read_product_image(self, image: Optional[str]) -> bytes:
+        """Read a product image from local disk, confined to PRODUCT_IMAGE_ROOT"""
+        if not image:
+            raise HTTPException(status_code=400, detail="Product has no image")
+        if "://" in image:
+            raise HTTPException(status_code=400, detail="Product image is not a local file")
+
+        root = os.path.realpath(self.settings.PRODUCT_IMAGE_ROOT)
+        relative_path = image[len("/static/"):] if image.startswith("/static/") else image.lstrip("/")
+        path = os.path.realpath(os.path.join(root, relative_path))
+        if os.path.commonpath([root, path]) != root:
+            raise HTTPException(status_code=400, detail="Product image is outside the image directory")
+
+        file_ext = os.path.splitext(path)[1].lower()
+        if file_ext not in self.settings.ALLOWED_EXTENSIONS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported file extension. Allowed extensions: {', '.join(self.settings.ALLOWED_EXTENSIONS)}"
+            )
+        if not os.path.isfile(path):
+            raise HTTPException(status_code=404, detail="Product image file not found")
+        if os.path.getsize(path) > self.settings.MAX_FILE_SIZE_BYTES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"File too large. Maximum size is {self.settings.max_file_size_mb}MB"
+            )
+        if os.path.getsize(path) == 0:
+            raise HTTPException(status_code=400, detail="Empty file")
+
+        with open(path, "rb") as f:
+            return f.read()
+
+    async def collect_batch(
+            self,
+            results: AsyncIterator[BatchAnalysisItem],
+            request: Optional[Request] = None
+    ) -> BatchAnalysisResponse:
+        """Wait for every batch item, cancelling the remaining analyses if the client disconnects"""
+        async def collect() -> List[BatchAnalysisItem]:
+            return [item async for item in results]
+
+        return self.summarize_batch(await self._cancel_on_disconnect(request, collect()))
+
+    @staticmethod
+    def summarize_batch(results: List[BatchAnalysisItem]) -> BatchAnalysisResponse:
+        """Collect per-item results into a batch response in request order"""
+        ordered = sorted(results, key=lambda item: item.index)
+        succeeded = sum(1 for item in ordered if item.status == "ok")
+        return BatchAnalysisResponse(
+            total=len(ordered),
+            succeeded=succeeded,
+            failed=len(ordered) - succeeded,
+            results=ordered
         )
 
+    async def stream_uploaded_image(
+            self,
+            file: UploadFile,
+            prompt: Optional[str] = None,
+            model_family: Optional[str] = None,
+            request: Optional[Request] = None
+    ) -> AsyncIterator[str]:
+        """
+        Analyze an uploaded image file, streaming the result as Server-Sent Events
+
+        Validation and the first Bedrock event are awaited before returning,
+        so upload and upstream errors still surface as regular HTTP errors.
+        Once streaming, a client disconnect cancels the response iterator,
+        which closes the Bedrock stream.
+
+        Args:
+            file: Uploaded image file
+            prompt: Custom analysis prompt
+            model_family: Optional model family (e.g. haiku, sonnet) to pin the request to
+            request: HTTP request, the analysis is cancelled if its client disconnects
+
+        Returns:
+            Async iterator of SSE frames
+        """
+        self._validate_file(file)
+        image_data = await self._read_file_data(file)
+        analysis_prompt = prompt or self.settings.DEFAULT_ANALYSIS_PROMPT
+
+        events = self.bedrock_service.stream_analysis(image_data, analysis_prompt, model_family)
+        first_event = await self._cancel_on_disconnect(request, events.__anext__())
+
+        return self._to_sse(first_event, events, len(image_data), analysis_prompt)
+
+    async def _to_sse(
+            self,
+            first_event: dict,
+            events: AsyncIterator[dict],
+            image_size: int,
+            prompt: str
+    ) -> AsyncIterator[str]:
+        """Format analysis events as SSE frames, recording token usage once the stream is done"""
+        try:
+            event = first_event
+            while True:
+                if event["type"] == "token":
+                    yield self._format_sse("token", {"text": event["text"]})
+                else:
+                    usage: TokenUsage = event["usage"]
+                    await self._record_usage(
+                        "analyze/stream", prompt, image_size, event["model_id"], usage, event["cached"]
+                    )
+                    yield self._format_sse("done", {
+                        "model_used": self._get_model_display_name(event["model_id"]),
+                        "image_size": f"{image_size} bytes",
+                        "time_to_first_token": round(event["time_to_first_token"], 3),
+                        "total_time": round(event["total_time"], 3),
+                        "cached": event["cached"],
+                        "stale": event["stale"],
+                        "original_processing_time": (
+                            round(event["original_processing_time"], 2)
+                            if event["original_processing_time"] is not None else None
+                        ),
+                        "input_tokens": usage.input_tokens,
+                        "output_tokens": usage.output_tokens,
+                        "cost": round(self.usage_meter.cost(
+                            event["model_id"], usage.input_tokens, usage.output_tokens
+                        ), 6)
+                    })
+                try:
+                    event = await events.__anext__()
+                except StopAsyncIteration:
+                    break
+        except HTTPException as e:
+            yield self._format_sse("error", {"detail": e.detail, "status_code": e.status_code})
+        finally:
+            await events.aclose()
+
+    async def submit_job(
+            self,
+            file: UploadFile,
+            prompt: Optional[str] = None,
+            model_family: Optional[str] = None
+    ) -> AnalysisJobResponse:
+        """
+        Queue an uploaded image for asynchronous analysis
+
+        Args:
+            file: Uploaded image file
+            prompt: Custom analysis prompt
+            model_family: Optional model family (e.g. haiku, sonnet) to pin the job to
+
+        Returns:
+            AnalysisJobResponse of the queued job
+        """
+        self._validate_file(file)
+        image_data = await self._read_file_data(file)
+        family = self.bedrock_service.validate_model_family(model_family)
+
+        job = await self.job_queue.submit(
+            image_data,
+            prompt or self.settings.DEFAULT_ANALYSIS_PROMPT,
+            filename=file.filename,
+            model_family=family
+        )
+        return self._build_job_response(job)
+
+    async def get_job(self, job_id: str, wait: float = 0.0) -> AnalysisJobResponse:
+        """
+        Get a job, optionally long-polling until it is finished
+
+        Args:
+            job_id: Job identifier
+            wait: Seconds to wait for the job to finish before returning its current state
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        job = await self._load_job(job_id)
+
+        while job.status not in FINISHED_STATUSES:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            await self.job_queue.wait_for_change(job_id, min(remaining, self.JOB_POLL_INTERVAL))
+            job = await self._load_job(job_id)
+
+        return self._build_job_response(job)
+
+    async def stream_job_events(self, job_id: str) -> AsyncIterator[str]:
+        """
+        Follow a job as Server-Sent Events
+
+        Emits a status event on every state change and ends with a done event
+        for succeeded jobs or an error event for failed and cancelled ones.
+        """
+        job = await self._load_job(job_id)
+        return self._job_events(job)
+
+    async def _job_events(self, job: AnalysisJob) -> AsyncIterator[str]:
+        last_status = None
+        while True:
+            if job.status != last_status:
+                last_status = job.status
+                data = json.loads(self._build_job_response(job).model_dump_json())
+                if job.status not in FINISHED_STATUSES:
+                    yield self._format_sse("status", data)
+                else:
+                    yield self._format_sse("done" if job.status == "succeeded" else "error", data)
+                    return
+            await self.job_queue.wait_for_change(job.id, self.JOB_POLL_INTERVAL)
+            job = await self._load_job(job.id)
+
+    async def cancel_job(self, job_id: str) -> AnalysisJobResponse:
+        """Cancel a job that has not started yet"""
+        job = await self._load_job(job_id)
+        if not await self.job_queue.cancel(job_id):
+            raise HTTPException(status_code=409, detail=f"Job is {job.status} and can no longer be cancelled")
+        return self._build_job_response(await self._load_job(job_id))
+
+    async def _load_job(self, job_id: str) -> AnalysisJob:
+        job = await run_in_threadpool(self.job_queue.get, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+
+    def _build_job_response(self, job: AnalysisJob) -> AnalysisJobResponse:
+        """Convert a job row into the API response model"""
+        result = None
+        if job.result:
+            fields = dict(job.result)
+            usage = TokenUsage(**fields.pop("usage", {}))
+            result = self._build_response(AnalysisResult(**fields, usage=usage), job.image_size)
+
+        return AnalysisJobResponse(
+            job_id=job.id,
+            status=job.status,
+            filename=job.filename,
+            model_family=job.model_family,
+            attempts=job.attempts,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+            result=result,
+            error=job.error,
+            status_code=job.status_code
+        )
+
+    @staticmethod
+    def _format_sse(event: str, data: dict) -> str:
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
     def _validate_file(self, file: UploadFile) -> None:
         """Validate uploaded file"""
         # Check if file exists
@@ -82,24 +551,47 @@ class ImageController:
             )
 
     async def _read_file_data(self, file: UploadFile) -> bytes:
-        """Read and validate file data"""
+        """
+        Read and validate file data
+
+        The upload is read UPLOAD_CHUNK_SIZE bytes at a time, so an oversized
+        file is rejected as soon as it crosses MAX_FILE_SIZE_BYTES and a file
+        that is not an image as soon as its first bytes are in.
+        """
+        limit = self.settings.MAX_FILE_SIZE_BYTES
+        too_large = HTTPException(
+            status_code=413,
+            detail=f"File too large. Maximum size is {self.settings.max_file_size_mb}MB"
+        )
+
         try:
-            image_data = await file.read()
+            # Starlette knows the size of a fully received part
+            if file.size is not None and file.size > limit:
+                raise too_large
+
+            image_data = bytearray()
+            signature_checked = False
+            while True:
+                chunk = await file.read(self.settings.UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if len(image_data) + len(chunk) > limit:
+                    raise too_large
+                image_data += chunk
+
+                if not signature_checked and len(image_data) >= SIGNATURE_LENGTH:
+                    self._check_signature(image_data)
+                    signature_checked = True
 
             if len(image_data) == 0:
                 raise HTTPException(
                     status_code=400,
                     detail="Empty file"
                 )
+            if not signature_checked:
+                self._check_signature(image_data)
 
-            # Check file size
-            if len(image_data) > self.settings.MAX_FILE_SIZE_BYTES:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"File too large. Maximum size is {self.settings.max_file_size_mb}MB"
-                )
-
-            return image_data
+            return bytes(image_data)
 
         except HTTPException:
             raise
@@ -109,30 +601,72 @@ class ImageController:
                 detail=f"Failed to read file: {str(e)}"
             )
 
-    def _get_model_display_name(self) -> str:
-        """Get display name for the current model"""
+    @staticmethod
+    def _check_signature(image_data: bytearray) -> None:
+        """Reject files whose magic number is not one of the supported image formats"""
+        if detect_image_type(bytes(image_data[:SIGNATURE_LENGTH])) is None:
+            raise HTTPException(
+                status_code=400,
+                detail="File content is not a supported image format"
+            )
+
+    def _get_model_display_name(self, model_id: Optional[str] = None) -> str:
+        """Get display name for the model that served a request, defaulting to the configured one"""
+        model_id = model_id or self.settings.BEDROCK_MODEL_ID
         model_names = {
             "anthropic.claude-3-haiku-20240307-v1:0": "Claude 3 Haiku (Bedrock)",
             "anthropic.claude-3-sonnet-20240229-v1:0": "Claude 3 Sonnet (Bedrock)",
             "anthropic.claude-3-opus-20240229-v1:0": "Claude 3 Opus (Bedrock)"
         }
-        return model_names.get(
-            self.settings.BEDROCK_MODEL_ID,
-            f"Claude 3 ({self.settings.BEDROCK_MODEL_ID})"
-        )
+        return model_names.get(model_id, f"Claude 3 ({model_id})")
+
+    def get_metrics(self) -> dict:
+        """Get Bedrock service metrics"""
+        metrics = self.bedrock_service.get_metrics()
+        metrics["cancellation"]["client_disconnects"] = self.client_disconnects
+        return {
+            **metrics,
+            "usage": self.usage_meter.get_stats(),
+            "jobs": self.job_queue.get_stats(),
+            "admission": self.admission_controller.get_stats()
+        }
+
+    def get_endpoint_stats(self) -> dict:
+        """Get health and traffic statistics of every Bedrock endpoint in the pool"""
+        router = self.bedrock_service.router
+        return {
+            "families": router.families,
+            "endpoints": router.get_stats()
+        }
+
+    async def clear_cache(self) -> dict:
+        """Drop all cached analyses"""
+        await run_in_threadpool(self.bedrock_service.cache.clear)
+        return {"message": "Analysis cache cleared"}
 
     def get_service_health(self) -> dict:
-        """Check service health"""
-        bedrock_healthy = self.bedrock_service.test_connection()
+        """Check service health from the last background probe, without any network calls"""
+        snapshot = self.health_monitor.get_snapshot()
+        bedrock_check = snapshot["checks"]["bedrock"]["status"]
+        breaker = self.bedrock_service.breaker.get_stats()
+        if breaker["state"] != "closed" and snapshot["status"] == "healthy":
+            snapshot["status"] = "degraded"
 
         return {
-            "status": "healthy" if bedrock_healthy else "degraded",
+            **snapshot,
+            "circuit_breaker": breaker,
             "service": self.settings.APP_NAME,
             "version": self.settings.APP_VERSION,
-            "bedrock_connection": "ok" if bedrock_healthy else "failed",
+            "bedrock_connection": {"ok": "ok", "failed": "failed"}.get(bedrock_check, "unknown"),
             "model": self.settings.BEDROCK_MODEL_ID
         }
 
+    def get_available_models(self) -> dict:
+        """Foundation models per region, as listed by the last background probe"""
+        return {
+            "checked_at": self.health_monitor.get_snapshot()["checked_at"],
+            "models": self.health_monitor.models
+        }
 
 # Global controller instance
 image_controller = ImageController()
\ No newline at end of file
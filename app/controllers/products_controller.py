@@ -10,6 +10,11 @@ class ProductsController:
         """Get product by ID"""
         return db.query(Product).filter(Product.id == product_id).first()
 
+    @staticmethod
+    def get_products_by_ids(db: Session, product_ids: List[int]) -> List[Product]:
+        """Get products matching any of the given IDs"""
+        return db.query(Product).filter(Product.id.in_(product_ids)).all()
+
     @staticmethod
     def get_all_products(db: Session, skip: int = 0, limit: int = 100) -> List[Product]:
         """Get all products with pagination"""
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, JSON, Date
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, JSON, Date, Float, UniqueConstraint, \
+    LargeBinary, Index
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from .database import Base
 
 class Product(Base):
@@ -68,4 +69,63 @@ class MarketingCampaignContentItem(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
-    campaign = relationship("MarketingCampaign", back_populates="content_items")
\ No newline at end of file
+    campaign = relationship("MarketingCampaign", back_populates="content_items")
+
+
+class AnalysisCacheEntry(Base):
+    """Persistent tier of the Bedrock image analysis cache"""
+    __tablename__ = "analysis_cache_entries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), nullable=False, unique=True, index=True)  # sha256 of image, prompt, model, max_tokens
+    model_id = Column(String, nullable=False)
+    analysis = Column(Text, nullable=False)
+    processing_time = Column(Float)  # Latency of the original Bedrock call in seconds
+    created_at = Column(DateTime, nullable=False, index=True)
+    last_accessed_at = Column(DateTime, nullable=False)
+
+
+class BedrockUsageDaily(Base):
+    """Daily Bedrock token usage and cost, aggregated per route, model, prompt and image size"""
+    __tablename__ = "bedrock_usage_daily"
+    __table_args__ = (
+        UniqueConstraint("day", "route", "model_id", "prompt_hash", "image_size_bucket",
+                         name="uq_bedrock_usage_daily_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False, index=True)  # UTC
+    route = Column(String, nullable=False)  # e.g. analyze, analyze/stream, analyze/batch
+    model_id = Column(String, nullable=False)
+    prompt_hash = Column(String(16), nullable=False)  # Truncated sha256 of the prompt
+    prompt_preview = Column(String, nullable=False)
+    image_size_bucket = Column(String, nullable=False)  # e.g. 100KB-512KB
+    requests = Column(Integer, nullable=False, default=0)
+    cached_requests = Column(Integer, nullable=False, default=0)
+    input_tokens = Column(Integer, nullable=False, default=0)
+    output_tokens = Column(Integer, nullable=False, default=0)
+    cost = Column(Float, nullable=False, default=0.0)  # USD
+
+
+class AnalysisJob(Base):
+    """Asynchronous image analysis job"""
+    __tablename__ = "analysis_jobs"
+    __table_args__ = (
+        Index("ix_analysis_jobs_status_available_at", "status", "available_at"),
+    )
+
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    status = Column(String, nullable=False, default="queued")  # queued, running, succeeded, failed, cancelled
+    filename = Column(String)
+    prompt = Column(Text, nullable=False)
+    model_family = Column(String)
+    image = deferred(Column(LargeBinary))  # Only loaded by the worker, dropped once the job is finished
+    image_size = Column(Integer, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    result = Column(JSON)  # AnalysisResult fields of a succeeded job
+    error = Column(Text)
+    status_code = Column(Integer)
+    created_at = Column(DateTime, nullable=False)  # naive UTC
+    available_at = Column(DateTime, nullable=False)  # not run before, pushed back on retries
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
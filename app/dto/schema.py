@@ -1,6 +1,6 @@
 # app/dto/schemas.py
 from typing import Optional, Dict, Any, List
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime, date
 
 
@@ -17,6 +17,52 @@ class ImageAnalysisResponse(BaseModel):
     model_used: str = Field(description="AI model used for analysis")
     image_size: Optional[str] = Field(default=None, description="Size of uploaded image")
     processing_time: Optional[float] = Field(default=None, description="Processing time in seconds")
+    cached: bool = Field(default=False, description="Whether the analysis was served from the cache")
+    stale: bool = Field(
+        default=False,
+        description="Whether an expired cached analysis was served because Bedrock is unavailable"
+    )
+    original_processing_time: Optional[float] = Field(
+        default=None,
+        description="Processing time of the original Bedrock call in seconds, set for cached results"
+    )
+    input_tokens: int = Field(default=0, description="Input tokens billed for this request")
+    output_tokens: int = Field(default=0, description="Output tokens billed for this request")
+    cost: float = Field(default=0.0, description="Estimated Bedrock cost of this request in USD")
+
+class BatchAnalysisItem(BaseModel):
+    """Outcome of one image in a batch analysis"""
+    index: int = Field(description="Position of the item in the request")
+    source: str = Field(description="Item source: file or product")
+    filename: Optional[str] = Field(default=None, description="Uploaded file name")
+    product_id: Optional[int] = Field(default=None, description="Product whose image was analyzed")
+    status: str = Field(description="ok or error")
+    result: Optional[ImageAnalysisResponse] = Field(default=None, description="Analysis result on success")
+    error: Optional[str] = Field(default=None, description="Error message on failure")
+    status_code: Optional[int] = Field(default=None, description="HTTP status equivalent of the error")
+
+class BatchAnalysisResponse(BaseModel):
+    """Response model for batch image analysis"""
+    total: int = Field(description="Number of items in the batch")
+    succeeded: int = Field(description="Number of items analyzed successfully")
+    failed: int = Field(description="Number of items that failed")
+    results: List[BatchAnalysisItem] = Field(description="Per-item results in request order")
+
+class AnalysisJobResponse(BaseModel):
+    """Status of an asynchronous image analysis job"""
+    model_config = ConfigDict(protected_namespaces=())
+
+    job_id: str = Field(description="Job identifier")
+    status: str = Field(description="Job status: queued, running, succeeded, failed or cancelled")
+    filename: Optional[str] = Field(default=None, description="Uploaded file name")
+    model_family: Optional[str] = Field(default=None, description="Pinned model family")
+    attempts: int = Field(default=0, description="Number of times a worker started the job")
+    created_at: datetime = Field(description="Submission time (UTC)")
+    started_at: Optional[datetime] = Field(default=None, description="Start of the last attempt (UTC)")
+    finished_at: Optional[datetime] = Field(default=None, description="Completion time (UTC)")
+    result: Optional[ImageAnalysisResponse] = Field(default=None, description="Analysis of a succeeded job")
+    error: Optional[str] = Field(default=None, description="Error of a failed job, or of the last failed attempt")
+    status_code: Optional[int] = Field(default=None, description="HTTP status matching the error")
 
 class HealthCheckResponse(BaseModel):
     """Health check response model"""
@@ -5,11 +5,17 @@ from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 
 from app.config.settings import settings
+from app.middleware import AdmissionControlMiddleware, BodySizeLimitMiddleware
 from app.routes import create_router
+from app.services.admission_controller import admission_controller
 
 from app.database.database import engine
 from app.database import models
 
+# Room for multipart boundaries, part headers and form fields next to a file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
 def create_app() -> FastAPI:
     """
     Create and configure the FastAPI application
@@ -31,6 +37,30 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
+    # Cap concurrent analyses, queued requests wait before their upload is read
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        controller=admission_controller,
+        paths=[
+            "/api/bedrock-demo/analyze",
+            "/api/bedrock-demo/analyze/stream",
+            "/api/bedrock-demo/analyze/batch",
+        ]
+    )
+
+    # Reject oversized uploads before they are spooled
+    upload_limit = settings.MAX_FILE_SIZE_BYTES + MULTIPART_OVERHEAD_BYTES
+    app.add_middleware(
+        BodySizeLimitMiddleware,
+        limits={
+            "/api/bedrock-demo/analyze": upload_limit,
+            "/api/bedrock-demo/analyze/stream": upload_limit,
+            "/api/bedrock-demo/jobs": upload_limit,
+            "/api/bedrock-demo/analyze/batch": upload_limit * settings.BEDROCK_BATCH_MAX_ITEMS,
+        },
+        default_limit=settings.MAX_REQUEST_BODY_BYTES
+    )
+
     # Mount static files (CSS, JS, images)
     app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
@@ -72,13 +102,24 @@ def create_app() -> FastAPI:
         except Exception as e:
             print(f"❌ Database connection: Failed - {str(e)}")
 
-        # Test Bedrock connection
+        # Probe credentials, Bedrock and the database in the background,
+        # results are logged as they come in and served by /api/bedrock-demo/health
+        from app.services.health_monitor import health_monitor
+        await health_monitor.start()
+
+        # Resume pending analysis jobs and start the job workers
+        from app.services.job_queue import job_queue
+        await job_queue.start()
+
+    # Shutdown event
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        from app.services.health_monitor import health_monitor
+        from app.services.job_queue import job_queue
         from app.services.bedrock import bedrock_service
-        if bedrock_service.test_connection():
-            print("✅ Bedrock connection: OK")
-        else:
-            print("❌ Bedrock connection: Failed")
-            print("   Please check your AWS credentials and Bedrock access")
+        await job_queue.stop()
+        await health_monitor.stop()
+        bedrock_service.shutdown()
 
     return app
 
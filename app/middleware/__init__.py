@@ -0,0 +1,3 @@
+# app/middleware/__init__.py
+from .body_limit import BodySizeLimitMiddleware
+from .admission import AdmissionControlMiddleware
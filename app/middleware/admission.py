@@ -0,0 +1,44 @@
+# app/middleware/admission.py
+import time
+from typing import Iterable
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.services.admission_controller import AdmissionController
+
+
+class AdmissionControlMiddleware:
+    """
+    Admits requests to the given paths through an AdmissionController
+
+    The slot is taken before the body is read, so queued requests hold no
+    upload in memory, and given back once the response has been sent in
+    full, streamed responses included. Rejected requests get 503 with a
+    Retry-After header.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController, paths: Iterable[str]):
+        self.app = app
+        self.controller = controller
+        self.paths = set(paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"].rstrip("/") not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        if not await self.controller.acquire():
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server is busy, too many analyses in progress. Please retry later"},
+                headers={"Retry-After": str(self.controller.retry_after())}
+            )
+            await response(scope, receive, send)
+            return
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(time.monotonic() - started)
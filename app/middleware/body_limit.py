@@ -0,0 +1,85 @@
+# app/middleware/body_limit.py
+from typing import Dict
+
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class BodySizeLimitMiddleware:
+    """
+    Rejects request bodies over a per-path limit before they are buffered
+
+    A declared Content-Length over the limit is answered with 413 without
+    reading the body. Otherwise the body is counted while the route
+    consumes it, and the read that crosses the limit fails with 413, so
+    chunked uploads without a Content-Length are cut off as well.
+    """
+
+    BODYLESS_METHODS = {"GET", "HEAD", "OPTIONS", "DELETE"}
+
+    def __init__(self, app: ASGIApp, limits: Dict[str, int], default_limit: int):
+        self.app = app
+        self.limits = limits
+        self.default_limit = default_limit
+        self.rejected = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] in self.BODYLESS_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.limits.get(scope["path"].rstrip("/") or "/", self.default_limit)
+        content_length = self._content_length(scope)
+        if content_length is not None and content_length > limit:
+            await self._reject(scope, receive, send, limit)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside the route's body parsing, FastAPI turns it into a 413 response
+                    raise HTTPException(status_code=413, detail=self._detail(limit))
+            return message
+
+        async def tracking_send(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except HTTPException as e:
+            if e.status_code != 413 or response_started:
+                raise
+            await self._reject(scope, receive, send, limit)
+
+    @staticmethod
+    def _content_length(scope: Scope):
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                try:
+                    return int(value)
+                except ValueError:
+                    return None
+        return None
+
+    @staticmethod
+    def _detail(limit: int) -> str:
+        return f"Request body too large. Maximum size is {limit} bytes"
+
+    async def _reject(self, scope: Scope, receive: Receive, send: Send, limit: int) -> None:
+        self.rejected += 1
+        response = JSONResponse(
+            status_code=413,
+            content={"detail": self._detail(limit)},
+            headers={"Connection": "close"}
+        )
+        await response(scope, receive, send)
@@ -1,7 +1,10 @@
 # app/routes/image_routes.py
-from fastapi import APIRouter, File, UploadFile, Form, HTTPException
-from typing import Optional
-from app.dto.schema import ImageAnalysisResponse
+from fastapi import APIRouter, Depends, File, UploadFile, Form, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.database.database import get_db
+from app.dto.schema import ImageAnalysisResponse, BatchAnalysisResponse, AnalysisJobResponse
 from app.controllers.image_controller import image_controller
 
 router = APIRouter()
@@ -9,20 +12,185 @@ router = APIRouter()
 #TODO: remove, just a simple bedrock usage example
 @router.post("/analyze", response_model=ImageAnalysisResponse)
 async def analyze_image(
+        request: Request,
         file: UploadFile = File(..., description="Image file to analyze"),
-        prompt: Optional[str] = Form(None, description="Custom analysis prompt")
+        prompt: Optional[str] = Form(None, description="Custom analysis prompt"),
+        model_family: Optional[str] = Form(None, description="Pin the request to a model family, e.g. haiku or sonnet")
 ):
     """
     Analyze an uploaded image using AI
 
     - **file**: Image file (JPEG, PNG, GIF, BMP, WebP)
     - **prompt**: Custom prompt for analysis (optional)
+    - **model_family**: Model family to use, e.g. `haiku` or `sonnet` (optional, any by default)
 
     Returns detailed AI analysis of the image.
     """
     try:
-        return await image_controller.analyze_uploaded_image(file, prompt)
+        return await image_controller.analyze_uploaded_image(file, prompt, model_family, request)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+
+@router.post("/analyze/stream")
+async def analyze_image_stream(
+        request: Request,
+        file: UploadFile = File(..., description="Image file to analyze"),
+        prompt: Optional[str] = Form(None, description="Custom analysis prompt"),
+        model_family: Optional[str] = Form(None, description="Pin the request to a model family, e.g. haiku or sonnet")
+):
+    """
+    Analyze an uploaded image using AI, streaming tokens as Server-Sent Events
+
+    - **file**: Image file (JPEG, PNG, GIF, BMP, WebP)
+    - **prompt**: Custom prompt for analysis (optional)
+    - **model_family**: Model family to use, e.g. `haiku` or `sonnet` (optional, any by default)
+
+    Emits `token` events with `{"text": ...}` as the model generates, then a
+    final `done` event with `time_to_first_token` and `total_time` in seconds,
+    or an `error` event if Bedrock fails mid-stream.
+    """
+    try:
+        events = await image_controller.stream_uploaded_image(file, prompt, model_family, request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/analyze/batch", response_model=BatchAnalysisResponse)
+async def analyze_image_batch(
+        request: Request,
+        files: List[UploadFile] = File([], description="Image files to analyze"),
+        product_ids: List[int] = Form([], description="Products whose local image should be analyzed"),
+        prompt: Optional[str] = Form(None, description="Custom analysis prompt for every item"),
+        model_family: Optional[str] = Form(None, description="Pin every item to a model family, e.g. haiku or sonnet"),
+        stream: bool = Query(False, description="Stream results as NDJSON as each item completes"),
+        db: Session = Depends(get_db)
+):
+    """
+    Analyze many images in one request
+
+    - **files**: Image files (JPEG, PNG, GIF, BMP, WebP)
+    - **product_ids**: Product IDs whose `image` points to a local file
+    - **prompt**: Custom prompt for analysis (optional)
+    - **model_family**: Model family to use for every item (optional)
+    - **stream**: Return `application/x-ndjson`, one result line per item as it completes
+
+    Items are analyzed with bounded concurrency. A failing item is reported
+    with `status: error` and does not fail the batch.
+    """
+    try:
+        results = await image_controller.analyze_batch(
+            db=db, files=files, product_ids=product_ids, prompt=prompt, model_family=model_family
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+    if stream:
+        async def ndjson():
+            async for item in results:
+                yield item.model_dump_json() + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    return await image_controller.collect_batch(results, request)
+
+
+@router.post("/jobs", response_model=AnalysisJobResponse, status_code=202)
+async def submit_analysis_job(
+        request: Request,
+        response: Response,
+        file: UploadFile = File(..., description="Image file to analyze"),
+        prompt: Optional[str] = Form(None, description="Custom analysis prompt"),
+        model_family: Optional[str] = Form(None, description="Pin the job to a model family, e.g. haiku or sonnet")
+):
+    """
+    Queue an image for analysis and return immediately
+
+    - **file**: Image file (JPEG, PNG, GIF, BMP, WebP)
+    - **prompt**: Custom prompt for analysis (optional)
+    - **model_family**: Model family to use, e.g. `haiku` or `sonnet` (optional, any by default)
+
+    Jobs are stored in the database and survive restarts. Poll
+    `GET /jobs/{job_id}` or follow `GET /jobs/{job_id}/events` for the result.
+    """
+    try:
+        job = await image_controller.submit_job(file, prompt, model_family)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+    response.headers["Location"] = str(request.url_for("get_analysis_job", job_id=job.job_id))
+    return job
+
+
+@router.get("/jobs/{job_id}", response_model=AnalysisJobResponse)
+async def get_analysis_job(
+        job_id: str,
+        wait: float = Query(0, ge=0, le=30, description="Seconds to wait for the job to finish")
+):
+    """Get the status and, once succeeded, the result of an analysis job"""
+    return await image_controller.get_job(job_id, wait)
+
+
+@router.get("/jobs/{job_id}/events")
+async def get_analysis_job_events(job_id: str):
+    """
+    Follow an analysis job as Server-Sent Events
+
+    Emits `status` events while the job is queued or running, then a final
+    `done` event for a succeeded job or `error` for a failed or cancelled one.
+    """
+    events = await image_controller.stream_job_events(job_id)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.delete("/jobs/{job_id}", response_model=AnalysisJobResponse)
+async def cancel_analysis_job(job_id: str):
+    """Cancel an analysis job that has not started yet"""
+    return await image_controller.cancel_job(job_id)
+
+@router.get("/metrics")
+async def get_metrics():
+    """Bedrock service counters (cache hits/misses, ...)"""
+    return image_controller.get_metrics()
+
+
+@router.delete("/cache")
+async def clear_cache():
+    """Drop every cached analysis from memory and the database"""
+    return await image_controller.clear_cache()
+
+
+@router.get("/admin/endpoints")
+async def get_endpoint_stats():
+    """Health score, latency, error rate and rate limiter state of every Bedrock region/model endpoint"""
+    return image_controller.get_endpoint_stats()
+
+
+@router.get("/health")
+async def get_health():
+    """Credentials, Bedrock and database health from the last background probe"""
+    return image_controller.get_service_health()
+
+
+@router.get("/models")
+async def get_available_models():
+    """Foundation models per region, cached by the background health probe"""
+    return image_controller.get_available_models()
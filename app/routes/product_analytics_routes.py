@@ -1,7 +1,9 @@
 # app/routes/analytics_routes.py
-from fastapi import APIRouter, Depends
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 from app.database.database import get_db
+from app.services.usage_meter import usage_meter
 
 router = APIRouter()
 
@@ -27,4 +29,15 @@ def get_product_analytics(db: Session = Depends(get_db)):
             {"product_name": name, "campaign_count": count}
             for name, count in products_with_campaigns
         ]
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/bedrock-usage/")
+def get_bedrock_usage(
+        days: int = Query(30, ge=1, le=366, description="Number of days to include, today counting as one"),
+        route: Optional[str] = Query(None, description="Only include one route, e.g. analyze/stream"),
+        limit: int = Query(10, ge=1, le=100, description="Number of prompts in top_prompts_by_tokens"),
+        db: Session = Depends(get_db)
+):
+    """Bedrock token usage and estimated cost by day, route, model, prompt and image size"""
+    return usage_meter.get_report(db, days=days, route=route, limit=limit)
@@ -0,0 +1,160 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Deque, Optional
+
+from app.config.settings import settings
+
+
+class AdmissionController:
+    """
+    Caps in-flight analysis requests, with a bounded FIFO wait queue
+
+    A request is admitted at once while fewer than max_in_flight are
+    running. Otherwise it waits in a queue of at most max_queue requests
+    for up to queue_timeout seconds; a finished request hands its slot
+    straight to the oldest waiter. A full queue or an expired wait is
+    rejected, with a Retry-After estimate from the average time a request
+    holds its slot. Meant to be used from the event loop only.
+    """
+
+    WAIT_SAMPLES = 512
+
+    def __init__(self, max_in_flight: int = 16, max_queue: int = 32, queue_timeout: float = 10.0):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._waits: Deque[float] = deque(maxlen=self.WAIT_SAMPLES)
+        self._avg_service_time = 1.0
+
+        self.peak_in_flight = 0
+        self.peak_queue_depth = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.total_wait_time = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_in_flight > 0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    async def acquire(self) -> bool:
+        """Take a slot, waiting in the queue if needed; False if rejected. Every True must be paired with release()"""
+        if not self.enabled:
+            return True
+
+        if self.in_flight < self.max_in_flight and not self.queue_depth:
+            self._admit(0.0)
+            return True
+
+        if self.queue_depth >= self.max_queue:
+            self.rejected_queue_full += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                waiter.cancel()
+                self.rejected_timeout += 1
+                return False
+            # The slot was handed over as the wait expired, keep it
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Handed a slot we will never use, pass it on
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+
+        self._record_wait(time.monotonic() - started)
+        return True
+
+    def release(self, service_time: Optional[float] = None) -> None:
+        """Give a slot back, to the oldest waiter if there is one"""
+        if not self.enabled:
+            return
+
+        if service_time is not None:
+            self._avg_service_time = 0.9 * self._avg_service_time + 0.1 * service_time
+
+        for waiter in self._waiters:
+            if not waiter.done():
+                # The slot moves to the waiter, in_flight stays the same
+                waiter.set_result(True)
+                self.admitted += 1
+                return
+        self.in_flight = max(0, self.in_flight - 1)
+
+    def retry_after(self) -> int:
+        """Seconds after which a rejected request is likely to be admitted"""
+        backlog = self.queue_depth + 1
+        estimate = self._avg_service_time * backlog / max(1, self.max_in_flight)
+        return max(1, min(60, math.ceil(estimate)))
+
+    def _admit(self, wait: float) -> None:
+        self.in_flight += 1
+        self.admitted += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        self._record_wait(wait)
+
+    def _record_wait(self, wait: float) -> None:
+        self._waits.append(wait)
+        self.total_wait_time += wait
+
+    def get_stats(self) -> dict:
+        """Limits, current load and wait-time percentiles over the last WAIT_SAMPLES admissions"""
+        waits = sorted(self._waits)
+
+        def percentile(p: float) -> float:
+            if not waits:
+                return 0.0
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 4)
+
+        return {
+            "enabled": self.enabled,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "queue_depth": self.queue_depth,
+            "peak_queue_depth": self.peak_queue_depth,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "avg_wait_time": round(self.total_wait_time / self.admitted, 4) if self.admitted else 0.0,
+            "p50_wait_time": percentile(0.50),
+            "p95_wait_time": percentile(0.95),
+            "max_wait_time": round(waits[-1], 4) if waits else 0.0,
+            "avg_service_time": round(self._avg_service_time, 3),
+            "retry_after": self.retry_after()
+        }
+
+
+# Global admission controller instance
+admission_controller = AdmissionController(
+    max_in_flight=settings.ADMISSION_MAX_IN_FLIGHT,
+    max_queue=settings.ADMISSION_MAX_QUEUE,
+    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS
+)
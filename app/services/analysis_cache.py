@@ -0,0 +1,298 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from app.config.settings import settings
+from app.database.database import SessionLocal
+from app.database.models import AnalysisCacheEntry
+
+
+@dataclass
+class CachedAnalysis:
+    """Analysis stored in the cache"""
+    analysis: str
+    processing_time: Optional[float]
+    created_at: datetime
+    model_id: Optional[str] = None
+
+
+class AnalysisCache:
+    """
+    Two-tier cache of Bedrock image analyses
+
+    Entries are keyed by a sha256 over the image bytes, prompt, model ID and
+    max_tokens. Lookups hit a bounded in-process LRU first and fall back to
+    the analysis_cache_entries table, promoting persistent hits into memory.
+    Expired entries are kept stale_seconds longer, only returned to lookups
+    that allow stale results. All methods are blocking and thread-safe; call them off the event loop.
+    """
+
+    def __init__(
+            self,
+            enabled: bool = True,
+            max_entries: int = 256,
+            ttl_seconds: int = 86400,
+            db_max_entries: int = 10000,
+            stale_seconds: int = 0
+    ):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_max_entries = db_max_entries
+        self.stale_seconds = stale_seconds
+
+        self._memory: "OrderedDict[str, CachedAnalysis]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes_since_prune = 0
+
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.stale_hits = 0
+        self.evictions = 0
+        self.db_errors = 0
+
+    @staticmethod
+    def make_key(image_data: bytes, prompt: str, model_id: str, max_tokens: int) -> str:
+        """Content-addressed cache key"""
+        digest = hashlib.sha256()
+        digest.update(hashlib.sha256(image_data).digest())
+        for part in (prompt, model_id, str(max_tokens)):
+            encoded = part.encode("utf-8")
+            digest.update(len(encoded).to_bytes(8, "big"))
+            digest.update(encoded)
+        return digest.hexdigest()
+
+    def _is_expired(self, entry: CachedAnalysis, now: datetime) -> bool:
+        return self.ttl_seconds > 0 and entry.created_at < now - timedelta(seconds=self.ttl_seconds)
+
+    def _is_dead(self, entry: CachedAnalysis, now: datetime) -> bool:
+        """Expired and past the stale window, no longer worth keeping"""
+        return self.ttl_seconds > 0 and \
+            entry.created_at < now - timedelta(seconds=self.ttl_seconds + self.stale_seconds)
+
+    def get(self, key: str, allow_stale: bool = False) -> Optional[CachedAnalysis]:
+        """
+        Look up a cached analysis, returning None on miss or expiry
+
+        With allow_stale, expired entries still inside the stale window are
+        returned too; compare created_at to the TTL to tell them apart.
+        """
+        if not self.enabled:
+            return None
+
+        now = datetime.utcnow()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._is_expired(entry, now):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry
+                if self._is_dead(entry, now):
+                    del self._memory[key]
+                    self.expired += 1
+                elif allow_stale:
+                    self.stale_hits += 1
+                    return entry
+                else:
+                    # The persistent copy is just as old
+                    self.misses += 1
+                    return None
+
+        entry = self._get_persistent(key, now, allow_stale)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            if self._is_expired(entry, now):
+                self.stale_hits += 1
+            else:
+                self.db_hits += 1
+        self._remember(key, entry)
+        return entry
+
+    def set(self, key: str, model_id: str, analysis: str, processing_time: float) -> None:
+        """Store an analysis in both tiers"""
+        if not self.enabled:
+            return
+
+        entry = CachedAnalysis(
+            analysis=analysis,
+            processing_time=processing_time,
+            created_at=datetime.utcnow(),
+            model_id=model_id
+        )
+        self._remember(key, entry)
+        self._set_persistent(key, model_id, entry)
+
+    def _remember(self, key: str, entry: CachedAnalysis) -> None:
+        """Insert into the LRU tier, evicting the least recently used entries"""
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self.evictions += 1
+
+    def _get_persistent(self, key: str, now: datetime, allow_stale: bool = False) -> Optional[CachedAnalysis]:
+        db = SessionLocal()
+        try:
+            row = db.query(AnalysisCacheEntry).filter(AnalysisCacheEntry.cache_key == key).first()
+            if row is None:
+                return None
+
+            entry = CachedAnalysis(
+                analysis=row.analysis,
+                processing_time=row.processing_time,
+                created_at=row.created_at,
+                model_id=row.model_id
+            )
+            if self._is_dead(entry, now):
+                db.delete(row)
+                db.commit()
+                with self._lock:
+                    self.expired += 1
+                return None
+            if self._is_expired(entry, now) and not allow_stale:
+                return None
+
+            row.last_accessed_at = now
+            db.commit()
+            return entry
+        except Exception as e:
+            db.rollback()
+            with self._lock:
+                self.db_errors += 1
+            print(f"⚠️  Analysis cache lookup failed: {e}")
+            return None
+        finally:
+            db.close()
+
+    def _set_persistent(self, key: str, model_id: str, entry: CachedAnalysis) -> None:
+        db = SessionLocal()
+        try:
+            row = db.query(AnalysisCacheEntry).filter(AnalysisCacheEntry.cache_key == key).first()
+            if row is None:
+                row = AnalysisCacheEntry(cache_key=key)
+                db.add(row)
+            row.model_id = model_id
+            row.analysis = entry.analysis
+            row.processing_time = entry.processing_time
+            row.created_at = entry.created_at
+            row.last_accessed_at = entry.created_at
+            db.commit()
+
+            with self._lock:
+                self._writes_since_prune += 1
+                should_prune = self._writes_since_prune >= 100
+                if should_prune:
+                    self._writes_since_prune = 0
+            if should_prune:
+                self._prune(db)
+        except IntegrityError:
+            # A concurrent request stored the same key first
+            db.rollback()
+        except Exception as e:
+            db.rollback()
+            with self._lock:
+                self.db_errors += 1
+            print(f"⚠️  Analysis cache write failed: {e}")
+        finally:
+            db.close()
+
+    def _prune(self, db) -> int:
+        """Delete rows past the stale window and trim the table to db_max_entries"""
+        removed = 0
+        if self.ttl_seconds > 0:
+            cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds + self.stale_seconds)
+            removed += db.query(AnalysisCacheEntry).filter(
+                AnalysisCacheEntry.created_at < cutoff
+            ).delete(synchronize_session=False)
+
+        overflow = db.query(AnalysisCacheEntry).count() - self.db_max_entries
+        if overflow > 0:
+            stale_ids = [
+                row_id for (row_id,) in db.query(AnalysisCacheEntry.id)
+                .order_by(AnalysisCacheEntry.last_accessed_at)
+                .limit(overflow)
+            ]
+            removed += db.query(AnalysisCacheEntry).filter(
+                AnalysisCacheEntry.id.in_(stale_ids)
+            ).delete(synchronize_session=False)
+
+        db.commit()
+        with self._lock:
+            self.evictions += removed
+        return removed
+
+    def purge(self) -> int:
+        """Drop entries past the stale window from both tiers, returning the number removed"""
+        now = datetime.utcnow()
+        with self._lock:
+            expired_keys = [k for k, v in self._memory.items() if self._is_dead(v, now)]
+            for k in expired_keys:
+                del self._memory[k]
+
+        db = SessionLocal()
+        try:
+            return len(expired_keys) + self._prune(db)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def clear(self) -> None:
+        """Remove every entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+
+        db = SessionLocal()
+        try:
+            db.query(AnalysisCacheEntry).delete(synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def get_stats(self) -> dict:
+        """Hit/miss counters and tier sizes"""
+        with self._lock:
+            hits = self.memory_hits + self.db_hits
+            lookups = hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "stale_seconds": self.stale_seconds,
+                "stale_hits": self.stale_hits,
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "db_errors": self.db_errors,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0
+            }
+
+
+# Global cache instance
+analysis_cache = AnalysisCache(
+    enabled=settings.ANALYSIS_CACHE_ENABLED,
+    max_entries=settings.ANALYSIS_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.ANALYSIS_CACHE_TTL_SECONDS,
+    db_max_entries=settings.ANALYSIS_CACHE_DB_MAX_ENTRIES,
+    stale_seconds=settings.ANALYSIS_CACHE_STALE_SECONDS
+)
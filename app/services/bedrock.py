@@ -1,42 +1,214 @@
-import base64
+import asyncio
 import json
+import math
+import random
+import threading
 import time
 import os
-from typing import Tuple
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError, NoCredentialsError, PartialCredentialsError
 from fastapi import HTTPException
 
 from app.config.settings import settings
+from app.services.analysis_cache import analysis_cache, CachedAnalysis
+from app.services.image_preprocessing import image_preprocessor
+from app.services.payload_builder import build_image_request
+from app.services.bedrock_router import BedrockEndpoint, BedrockRouter
+from app.services.connection_pool_metrics import ConnectionPoolMetrics
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.single_flight import SingleFlight
+
+
+# Errors that signal Bedrock wants us to slow down
+THROTTLING_ERROR_CODES = {'ThrottlingException', 'ServiceQuotaExceededException'}
+# Errors worth retrying without adapting the request rate
+TRANSIENT_ERROR_CODES = {'ModelNotReadyException', 'ServiceUnavailableException', 'InternalServerException'}
+# Outcomes that count against the circuit breaker and may be answered from a stale cache entry
+UNAVAILABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+@dataclass
+class TokenUsage:
+    """Tokens billed for one Bedrock invocation"""
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+
+@dataclass
+class AnalysisResult:
+    """Outcome of an image analysis"""
+    analysis: str
+    processing_time: float
+    model_id: Optional[str] = None
+    cached: bool = False
+    original_processing_time: Optional[float] = None
+    stale: bool = False  # expired cache entry served while Bedrock is unavailable
+    # Zero for cached results and for requests that joined another request's call
+    usage: TokenUsage = field(default_factory=TokenUsage)
+
+
+def _discard_result(future, discard: Optional[Callable]) -> None:
+    """Done callback for results nobody awaits: retrieve errors, clean up successful results"""
+    if future.cancelled() or future.exception() is not None:
+        return
+    if discard is not None:
+        discard(future.result())
 
 
 class BedrockService:
     """Service for interacting with Amazon Bedrock"""
 
     def __init__(self):
-        self._client = None
-        self._bedrock_client = None
+        self._clients = {}
+        self._clients_lock = threading.Lock()
+        self._executor = None
+        self.cache = analysis_cache
+        self.preprocessor = image_preprocessor
+        self.router = BedrockRouter.from_settings()
+        self.retry_stats = {"attempts": 0, "retries": 0, "failovers": 0, "exhausted": 0, "deadline_exceeded": 0}
+        self.cancellation_stats = {
+            "requests_cancelled": 0,
+            "dropped_before_start": 0,
+            "abandoned_in_flight": 0,
+            "streams_aborted": 0
+        }
+        self.single_flight = SingleFlight()
+        self.breaker = CircuitBreaker(
+            window=settings.BEDROCK_BREAKER_WINDOW,
+            min_calls=settings.BEDROCK_BREAKER_MIN_CALLS,
+            error_rate=settings.BEDROCK_BREAKER_ERROR_RATE,
+            slow_call_seconds=settings.BEDROCK_BREAKER_SLOW_CALL_SECONDS,
+            slow_call_rate=settings.BEDROCK_BREAKER_SLOW_CALL_RATE,
+            open_seconds=settings.BEDROCK_BREAKER_OPEN_SECONDS,
+            half_open_calls=settings.BEDROCK_BREAKER_HALF_OPEN_CALLS,
+            enabled=settings.BEDROCK_BREAKER_ENABLED
+        )
+        self.stale_fallbacks = 0
+        # Connection pool counters of the bedrock-runtime client of each region
+        self.pool_metrics: Dict[str, ConnectionPoolMetrics] = {}
+
+        if self.pool_size < settings.BEDROCK_MAX_CONCURRENCY:
+            print(f"⚠️ BEDROCK_POOL_CONNECTIONS={self.pool_size} is below BEDROCK_MAX_CONCURRENCY="
+                  f"{settings.BEDROCK_MAX_CONCURRENCY}, calls beyond the pool open throwaway connections")
 
     @property
     def client(self):
-        """Lazy initialization of Bedrock runtime client"""
-        if self._client is None:
-            self._client = self._initialize_client('bedrock-runtime')
-        return self._client
+        """Lazy initialization of Bedrock runtime client for the default region"""
+        return self.runtime_client(settings.AWS_REGION)
+
+    def runtime_client(self, region: str):
+        """Lazy, per-region initialization of Bedrock runtime clients"""
+        return self._regional_client('bedrock-runtime', region, self._runtime_config())
+
+    @property
+    def pool_size(self) -> int:
+        """Connections kept per bedrock-runtime client"""
+        return settings.BEDROCK_POOL_CONNECTIONS or settings.BEDROCK_MAX_CONCURRENCY
+
+    def _runtime_config(self) -> Config:
+        """
+        Config of the bedrock-runtime clients
+
+        The pool holds a connection for every executor thread, kept alive
+        between calls. Retries are handled by _call_with_retry under the
+        adaptive rate limiters unless BEDROCK_SDK_MAX_ATTEMPTS allows more.
+        """
+        return Config(
+            max_pool_connections=self.pool_size,
+            tcp_keepalive=settings.BEDROCK_TCP_KEEPALIVE,
+            connect_timeout=settings.BEDROCK_CONNECT_TIMEOUT_SECONDS,
+            read_timeout=settings.BEDROCK_READ_TIMEOUT_SECONDS,
+            retries={
+                'total_max_attempts': settings.BEDROCK_SDK_MAX_ATTEMPTS,
+                'mode': settings.BEDROCK_SDK_RETRY_MODE
+            }
+        )
 
     @property
     def bedrock_client(self):
         """Lazy initialization of Bedrock client (for listing dto)"""
-        if self._bedrock_client is None:
-            self._bedrock_client = self._initialize_client('bedrock')
-        return self._bedrock_client
+        return self.control_client(settings.AWS_REGION)
+
+    def control_client(self, region: str):
+        """Lazy, per-region initialization of Bedrock control plane clients"""
+        return self._regional_client('bedrock', region, self._probe_config())
+
+    @property
+    def sts_client(self):
+        """Lazy initialization of the STS client used to verify credentials"""
+        return self._regional_client('sts', settings.AWS_REGION, self._probe_config())
+
+    @staticmethod
+    def _probe_config() -> Config:
+        """
+        Config of the clients behind health probes
+
+        A single attempt whose connect and read timeouts add up to less than
+        HEALTH_CHECK_TIMEOUT_SECONDS, so a hanging endpoint fails the call
+        instead of leaving a probe thread blocked after the check gave up.
+        """
+        timeout = settings.HEALTH_CHECK_TIMEOUT_SECONDS
+        return Config(
+            connect_timeout=timeout / 4,
+            read_timeout=timeout / 2,
+            retries={'total_max_attempts': 1, 'mode': 'standard'}
+        )
+
+    def _regional_client(self, service_name: str, region: str, config: Optional[Config] = None):
+        """Create a client once per service and region, boto3 clients are thread-safe"""
+        client = self._clients.get((service_name, region))
+        if client is None:
+            with self._clients_lock:
+                client = self._clients.get((service_name, region))
+                if client is None:
+                    client = self._initialize_client(service_name, config=config, region=region)
+                    if service_name == 'bedrock-runtime':
+                        metrics = ConnectionPoolMetrics(self.pool_size)
+                        if metrics.instrument(client):
+                            self.pool_metrics[region] = metrics
+                    self._clients[(service_name, region)] = client
+        return client
+
+    def get_caller_identity(self) -> dict:
+        """Blocking STS call returning the ARN and account of the configured credentials"""
+        identity = self.sts_client.get_caller_identity()
+        return {"arn": identity.get('Arn'), "account": identity.get('Account')}
+
+    def list_model_ids(self, region: str) -> List[str]:
+        """Blocking call listing the foundation model IDs available in a region"""
+        response = self.control_client(region).list_foundation_models()
+        return [model['modelId'] for model in response.get('modelSummaries', [])]
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Lazy initialization of the bounded executor used for blocking boto3 calls"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.BEDROCK_MAX_CONCURRENCY,
+                thread_name_prefix="bedrock"
+            )
+        return self._executor
 
-    def _initialize_client(self, service_name):
+    def shutdown(self):
+        """Release the executor threads"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _initialize_client(self, service_name, config: Optional[Config] = None, region: Optional[str] = None):
         """Initialize the Bedrock client"""
         try:
             client_config = {
-                'region_name': settings.AWS_REGION
+                'region_name': region or settings.AWS_REGION
             }
+            if config is not None:
+                client_config['config'] = config
+            if settings.AWS_ENDPOINT_URL:
+                client_config['endpoint_url'] = settings.AWS_ENDPOINT_URL
 
             # Add credentials if provided via environment variables
             if settings.AWS_ACCESS_KEY_ID and settings.AWS_SECRET_ACCESS_KEY:
@@ -53,61 +225,520 @@ class BedrockService:
                 detail=f"Failed to initialize {service_name} client: {str(e)}"
             )
 
-    def analyze_image(self, image_data: bytes, prompt: str) -> Tuple[str, float]:
+    def validate_model_family(self, model_family: Optional[str]) -> Optional[str]:
+        """Normalise a pinned model family, rejecting families no endpoint serves"""
+        if not model_family:
+            return None
+        family = model_family.strip().lower()
+        if family not in self.router.families:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported model family: {model_family}. Available: {', '.join(self.router.families)}"
+            )
+        return family
+
+    def _cache_key(self, image_data: bytes, prompt: str, family: Optional[str]) -> str:
         """
-        Analyze image using Amazon Bedrock's Claude model
+        Cache key for a request
+
+        Unpinned requests may be served by any endpoint of the pool and share
+        one key; pinned requests only reuse analyses from the same family.
+        """
+        model = f"family:{family}" if family else settings.BEDROCK_MODEL_ID
+        return self.cache.make_key(image_data, prompt, model, settings.BEDROCK_MAX_TOKENS)
+
+    async def analyze_image(
+            self,
+            image_data: bytes,
+            prompt: str,
+            model_family: Optional[str] = None
+    ) -> AnalysisResult:
+        """
+        Analyze image using Amazon Bedrock's Claude model without blocking the event loop
+
+        The boto3 call runs on a bounded executor, so at most
+        BEDROCK_MAX_CONCURRENCY invocations are in flight per worker and the
+        remaining requests on the worker keep being served meanwhile.
+        Results are cached by content hash of the image, prompt, model ID and
+        max_tokens, so repeated submissions skip invoke_model entirely, and
+        concurrent requests for the same key await one shared upstream call.
+        While the circuit breaker is open calls fail fast with 503, or are
+        answered from a stale cache entry if BEDROCK_STALE_FALLBACK is set.
 
         Args:
             image_data: Raw image bytes
             prompt: Analysis prompt
+            model_family: Optional family (e.g. haiku, sonnet) to pin the request to
 
         Returns:
-            Tuple of (analysis_text, processing_time)
+            AnalysisResult with the analysis text, timing, the model that produced it and its token usage
+        """
+        start_time = time.time()
+        loop = asyncio.get_running_loop()
+        family = self.validate_model_family(model_family)
+
+        cache_key = self._cache_key(image_data, prompt, family)
+        if self.cache.enabled:
+            cached = await loop.run_in_executor(None, self.cache.get, cache_key)
+            if cached is not None:
+                return AnalysisResult(
+                    analysis=cached.analysis,
+                    processing_time=time.time() - start_time,
+                    model_id=cached.model_id,
+                    cached=True,
+                    original_processing_time=cached.processing_time
+                )
+
+        # Identical concurrent requests share a single upstream call; cancelling
+        # this request only cancels the call once no other request awaits it
+        try:
+            (analysis, model_id, usage), shared = await self.single_flight.do(
+                cache_key, lambda: self._analyze_uncached(cache_key, image_data, prompt, family)
+            )
+        except asyncio.CancelledError:
+            self.cancellation_stats["requests_cancelled"] += 1
+            raise
+        except HTTPException as e:
+            stale = await self._stale_fallback(e, cache_key)
+            if stale is None:
+                raise
+            return AnalysisResult(
+                analysis=stale.analysis,
+                processing_time=time.time() - start_time,
+                model_id=stale.model_id,
+                cached=True,
+                original_processing_time=stale.processing_time,
+                stale=True
+            )
+
+        return AnalysisResult(
+            analysis=analysis,
+            processing_time=time.time() - start_time,
+            model_id=model_id,
+            # The shared call is billed once, to the request that started it
+            usage=TokenUsage() if shared else usage
+        )
+
+    async def _analyze_uncached(
+            self,
+            cache_key: str,
+            image_data: bytes,
+            prompt: str,
+            family: Optional[str]
+    ) -> Tuple[str, str, TokenUsage]:
+        """Invoke Bedrock and store the result in the cache"""
+        start_time = time.time()
+        loop = asyncio.get_running_loop()
+
+        async def call():
+            body = await self._run_on_executor(self._build_request_body, image_data, prompt)
+            return await self._call_with_retry(self._invoke_model, body, family)
+
+        (analysis, usage), endpoint = await self._through_breaker(call)
+        processing_time = time.time() - start_time
+
+        if self.cache.enabled:
+            await loop.run_in_executor(
+                None, self.cache.set, cache_key, endpoint.model_id, analysis, processing_time
+            )
+
+        return analysis, endpoint.model_id, usage
+
+    async def _call_with_retry(
+            self,
+            fn: Callable,
+            body: bytearray,
+            family: Optional[str] = None,
+            discard: Optional[Callable] = None
+    ) -> Tuple[object, BedrockEndpoint]:
+        """
+        Run a blocking Bedrock call on the executor against the endpoint pool
+
+        Each attempt goes to an endpoint picked by the router and is paced by
+        that endpoint's adaptive rate limiter. Throttling and transient errors
+        fail over to the next endpoint that has not been tried yet; once every
+        candidate failed, the round is retried with full-jitter exponential
+        backoff until BEDROCK_MAX_RETRIES or the per-request deadline is
+        exhausted, and the last error is then mapped to an HTTPException.
+
+        Args:
+            fn: Blocking callable taking (client, model_id, body)
+            body: Serialized request body
+            family: Optional model family to restrict the pool to
+            discard: Cleanup for a result that arrives after the caller was cancelled
+
+        Returns:
+            Tuple of (fn result, endpoint that served it)
+        """
+        deadline = time.monotonic() + settings.BEDROCK_REQUEST_DEADLINE_SECONDS
+        attempt = 0
+        tried = set()
+        last_error: Optional[ClientError] = None
+
+        while True:
+            endpoint = self.router.select(family, exclude=tried)
+            if endpoint is None:
+                # Every candidate failed in this round
+                tried.clear()
+                attempt += 1
+                backoff = random.uniform(
+                    0, min(settings.BEDROCK_RETRY_MAX_DELAY, settings.BEDROCK_RETRY_BASE_DELAY * 2 ** attempt)
+                )
+                if attempt > settings.BEDROCK_MAX_RETRIES:
+                    self.retry_stats["exhausted"] += 1
+                    self._handle_bedrock_error(last_error, family)
+                if time.monotonic() + backoff > deadline:
+                    self.retry_stats["deadline_exceeded"] += 1
+                    self._handle_bedrock_error(last_error, family)
+
+                self.retry_stats["retries"] += 1
+                await asyncio.sleep(backoff)
+                continue
+
+            if not await endpoint.rate_limiter.acquire(deadline):
+                self.retry_stats["deadline_exceeded"] += 1
+                raise self._throttled_exception("Request rate exceeded. Please try again later.", family)
+
+            self.retry_stats["attempts"] += 1
+            client = self.runtime_client(endpoint.region)
+            started = time.monotonic()
+            endpoint.in_flight += 1
+            try:
+                result = await self._run_on_executor(fn, client, endpoint.model_id, body, discard=discard)
+            except ClientError as e:
+                error_code = e.response['Error']['Code']
+                if error_code in THROTTLING_ERROR_CODES:
+                    endpoint.rate_limiter.on_throttle()
+                elif error_code not in TRANSIENT_ERROR_CODES:
+                    self._handle_bedrock_error(e, family)
+
+                endpoint.record_failure(error_code)
+                tried.add(endpoint)
+                last_error = e
+                if self.router.select(family, exclude=tried) is not None:
+                    endpoint.failovers += 1
+                    self.retry_stats["failovers"] += 1
+                continue
+            finally:
+                endpoint.in_flight -= 1
+
+            endpoint.rate_limiter.on_success()
+            endpoint.record_success(time.monotonic() - started)
+            return result, endpoint
+
+    async def _run_on_executor(self, fn: Callable, *args, discard: Optional[Callable] = None):
+        """
+        Run a blocking call on the service executor so that cancelling the caller frees resources
+
+        A call still waiting for an executor thread is dropped. A call that
+        already started cannot be interrupted; its result is passed to
+        discard once it completes, e.g. to close a response stream.
+        """
+        future = self.executor.submit(fn, *args)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            if future.cancel():
+                self.cancellation_stats["dropped_before_start"] += 1
+            else:
+                self.cancellation_stats["abandoned_in_flight"] += 1
+                if discard is not None:
+                    future.add_done_callback(lambda f: _discard_result(f, discard))
+            raise
+
+    async def _through_breaker(self, call: Callable[[], Awaitable]):
+        """
+        Run a Bedrock call under the circuit breaker, failing fast with 503 while it is open
+
+        Throttling and server errors count as failures. Client errors count
+        as successes, as Bedrock did answer.
+        """
+        if not self.breaker.allow():
+            retry_after = max(1, math.ceil(self.breaker.retry_after()))
+            raise HTTPException(
+                status_code=503,
+                detail="Bedrock is unavailable, requests are failing fast. Please try again later.",
+                headers={"Retry-After": str(retry_after)}
+            )
+
+        started = time.monotonic()
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except HTTPException as e:
+            if e.status_code in UNAVAILABLE_STATUS_CODES:
+                self.breaker.record_failure(time.monotonic() - started)
+            else:
+                self.breaker.record_success(time.monotonic() - started)
+            raise
+        except Exception:
+            self.breaker.record_failure(time.monotonic() - started)
+            raise
+        self.breaker.record_success(time.monotonic() - started)
+        return result
+
+    async def _stale_fallback(self, error: HTTPException, cache_key: str) -> Optional[CachedAnalysis]:
+        """Expired cache entry to answer with when Bedrock is unavailable and stale fallback is on"""
+        if not (settings.BEDROCK_STALE_FALLBACK and self.cache.enabled) or \
+                error.status_code not in UNAVAILABLE_STATUS_CODES:
+            return None
+        loop = asyncio.get_running_loop()
+        stale = await loop.run_in_executor(None, lambda: self.cache.get(cache_key, allow_stale=True))
+        if stale is not None:
+            self.stale_fallbacks += 1
+        return stale
+
+    def _throttled_exception(self, message: str, family: Optional[str] = None) -> HTTPException:
+        retry_after = max(1, math.ceil(self.router.time_until_available(family)))
+        return HTTPException(status_code=429, detail=message, headers={"Retry-After": str(retry_after)})
+
+    def get_pool_stats(self) -> dict:
+        """
+        Connection pool usage of every bedrock-runtime client
+
+        saturated_requests counts calls that found every pooled connection
+        busy and had to open one that is closed again right after, which
+        also lowers reuse_ratio. If it grows under load while peak_in_use
+        sits at max_size, raise BEDROCK_POOL_CONNECTIONS or lower
+        BEDROCK_MAX_CONCURRENCY.
+        """
+        return {
+            "max_size": self.pool_size,
+            "executor_threads": settings.BEDROCK_MAX_CONCURRENCY,
+            "keepalive": settings.BEDROCK_TCP_KEEPALIVE,
+            "connect_timeout": settings.BEDROCK_CONNECT_TIMEOUT_SECONDS,
+            "read_timeout": settings.BEDROCK_READ_TIMEOUT_SECONDS,
+            "regions": {region: metrics.get_stats() for region, metrics in list(self.pool_metrics.items())}
+        }
+
+    def get_metrics(self) -> dict:
+        """Runtime counters of the service and its components"""
+        return {
+            "cache": self.cache.get_stats(),
+            "endpoints": self.router.get_stats(),
+            "connection_pool": self.get_pool_stats(),
+            "retries": dict(self.retry_stats),
+            "cancellation": dict(self.cancellation_stats),
+            "circuit_breaker": {**self.breaker.get_stats(), "stale_fallbacks": self.stale_fallbacks},
+            "coalescing": self.single_flight.get_stats()
+        }
+
+    async def stream_analysis(
+            self,
+            image_data: bytes,
+            prompt: str,
+            model_family: Optional[str] = None
+    ) -> AsyncIterator[dict]:
+        """
+        Analyze image and relay generated text as it arrives from Bedrock
+
+        Uses invoke_model_with_response_stream on the service executor and
+        hands every text delta to the event loop through a queue.
+
+        Args:
+            image_data: Raw image bytes
+            prompt: Analysis prompt
+            model_family: Optional family (e.g. haiku, sonnet) to pin the request to
+
+        Yields:
+            {"type": "token", "text": ...} for every text delta, then one
+            {"type": "done", ...} event carrying model_id, usage, time_to_first_token and total_time
         """
         start_time = time.time()
+        loop = asyncio.get_running_loop()
+        family = self.validate_model_family(model_family)
+
+        cache_key = self._cache_key(image_data, prompt, family)
+        if self.cache.enabled:
+            cached = await loop.run_in_executor(None, self.cache.get, cache_key)
+            if cached is not None:
+                for event in self._cached_events(cached, time.time() - start_time):
+                    yield event
+                return
+
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def emit(item):
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+
+        async def call():
+            body = await self._run_on_executor(self._build_request_body, image_data, prompt)
+            # Only opening the stream is retried, once tokens flow a failure is final
+            return await self._call_with_retry(
+                self._open_stream, body, family, discard=lambda opened: opened.close()
+            )
 
         try:
-            # Encode image to base64
-            image_base64 = base64.b64encode(image_data).decode('utf-8')
-
-            # Prepare the request body for Claude 3
-            request_body = {
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": settings.BEDROCK_MAX_TOKENS,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "image",
-                                "source": {
-                                    "type": "base64",
-                                    "media_type": "image/jpeg",
-                                    "data": image_base64
-                                }
-                            },
-                            {
-                                "type": "text",
-                                "text": prompt
-                            }
-                        ]
-                    }
-                ]
+            stream, endpoint = await self._through_breaker(call)
+        except asyncio.CancelledError:
+            self.cancellation_stats["requests_cancelled"] += 1
+            raise
+        except HTTPException as e:
+            stale = await self._stale_fallback(e, cache_key)
+            if stale is None:
+                raise
+            for event in self._cached_events(stale, time.time() - start_time, stale=True):
+                yield event
+            return
+        producer = self.executor.submit(self._relay_stream, stream, emit)
+
+        parts = []
+        time_to_first_token = None
+        finished = False
+        try:
+            while True:
+                kind, payload = await queue.get()
+                if kind == "end":
+                    break
+                if time_to_first_token is None:
+                    time_to_first_token = time.time() - start_time
+                parts.append(payload)
+                yield {"type": "token", "text": payload}
+            finished = True
+        finally:
+            if not finished:
+                # Consumer went away (client disconnect or cancellation): closing the
+                # response makes the relay thread's read fail, freeing its executor thread
+                self.cancellation_stats["streams_aborted"] += 1
+                stream.close()
+                producer.add_done_callback(lambda f: _discard_result(f, None))
+
+        # Re-raises errors from the producer thread
+        usage = await asyncio.wrap_future(producer)
+        total_time = time.time() - start_time
+
+        if self.cache.enabled:
+            await loop.run_in_executor(
+                None, self.cache.set, cache_key, endpoint.model_id, "".join(parts), total_time
+            )
+
+        yield {
+            "type": "done",
+            "model_id": endpoint.model_id,
+            "usage": usage,
+            "time_to_first_token": time_to_first_token if time_to_first_token is not None else total_time,
+            "total_time": total_time,
+            "cached": False,
+            "stale": False,
+            "original_processing_time": None
+        }
+
+    @staticmethod
+    def _cached_events(cached: CachedAnalysis, elapsed: float, stale: bool = False) -> List[dict]:
+        """Stream events replaying a cached analysis as a single token"""
+        return [
+            {"type": "token", "text": cached.analysis},
+            {
+                "type": "done",
+                "model_id": cached.model_id,
+                "usage": TokenUsage(),
+                "time_to_first_token": elapsed,
+                "total_time": elapsed,
+                "cached": True,
+                "stale": stale,
+                "original_processing_time": cached.processing_time
             }
+        ]
+
+    def _build_request_body(self, image_data: bytes, prompt: str) -> bytearray:
+        """Serialize the Claude 3 messages request for an image and prompt"""
+        # Sniff, downsize and re-encode the upload
+        image = self.preprocessor.prepare(image_data)
+
+        # JSON envelope and base64 image in one buffer, without intermediate copies
+        return build_image_request(image.data, image.media_type, prompt, settings.BEDROCK_MAX_TOKENS)
+
+    def _invoke_model(self, client, model_id: str, body: bytearray) -> Tuple[str, TokenUsage]:
+        """
+        Blocking Bedrock invocation, run on the service executor
 
+        Args:
+            client: bedrock-runtime client of the endpoint's region
+            model_id: Model of the endpoint
+            body: Serialized request body
+
+        Returns:
+            Tuple of (analysis text, token usage)
+
+        Raises:
+            ClientError as-is, so the caller can decide on retries
+        """
+        try:
             # Call Bedrock
-            response = self.client.invoke_model(
-                modelId=settings.BEDROCK_MODEL_ID,
-                body=json.dumps(request_body),
+            response = client.invoke_model(
+                modelId=model_id,
+                body=body,
                 contentType="application/json"
             )
 
             # Parse response
             response_body = json.loads(response['body'].read())
-            analysis = response_body['content'][0]['text']
+            usage = response_body.get('usage', {})
+            return response_body['content'][0]['text'], TokenUsage(
+                input_tokens=usage.get('input_tokens', 0),
+                output_tokens=usage.get('output_tokens', 0)
+            )
+
+        except (ClientError, HTTPException):
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Analysis failed: {str(e)}"
+            )
+
+    def _open_stream(self, client, model_id: str, body: bytearray):
+        """
+        Blocking call that starts a streaming Bedrock invocation
+
+        Raises:
+            ClientError as-is, so the caller can decide on retries
+        """
+        try:
+            response = client.invoke_model_with_response_stream(
+                modelId=model_id,
+                body=body,
+                contentType="application/json"
+            )
+            return response['body']
+
+        except (ClientError, HTTPException):
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Analysis failed: {str(e)}"
+            )
+
+    def _relay_stream(self, stream, emit: Callable) -> TokenUsage:
+        """
+        Read a Bedrock response stream on the service executor
 
-            processing_time = time.time() - start_time
-            return analysis, processing_time
+        Calls emit(("token", text)) for every text delta and always finishes
+        with emit(("end", None)) so the consumer never waits forever.
+
+        Returns:
+            Token usage reported by the message_start and message_delta events
+        """
+        usage = TokenUsage()
+        try:
+            for event in stream:
+                chunk = event.get('chunk')
+                if not chunk:
+                    continue
+                payload = json.loads(chunk['bytes'])
+                event_type = payload.get('type')
+                if event_type == 'content_block_delta':
+                    text = payload.get('delta', {}).get('text')
+                    if text:
+                        emit(("token", text))
+                elif event_type == 'message_start':
+                    usage.input_tokens = payload.get('message', {}).get('usage', {}).get('input_tokens', 0)
+                elif event_type == 'message_delta':
+                    usage.output_tokens = payload.get('usage', {}).get('output_tokens', usage.output_tokens)
+            return usage
 
         except ClientError as e:
             self._handle_bedrock_error(e)
@@ -116,8 +747,10 @@ class BedrockService:
                 status_code=500,
                 detail=f"Analysis failed: {str(e)}"
             )
+        finally:
+            emit(("end", None))
 
-    def _handle_bedrock_error(self, error: ClientError):
+    def _handle_bedrock_error(self, error: ClientError, family: Optional[str] = None):
         """Handle specific Bedrock errors"""
         error_code = error.response['Error']['Code']
         error_mappings = {
@@ -134,6 +767,8 @@ class BedrockService:
             (500, f"Bedrock error: {str(error)}")
         )
 
+        if status_code == 429:
+            raise self._throttled_exception(message, family)
         raise HTTPException(status_code=status_code, detail=message)
 
     def test_connection(self) -> bool:
@@ -144,8 +779,7 @@ class BedrockService:
             # Test 1: Check AWS credentials
             print("🔍 Step 1: Testing AWS credentials...")
             try:
-                sts_client = boto3.client('sts', region_name=settings.AWS_REGION)
-                identity = sts_client.get_caller_identity()
+                identity = self.sts_client.get_caller_identity()
                 print(f"✅ AWS Identity: {identity.get('Arn', 'Unknown')}")
                 print(f"✅ Account ID: {identity.get('Account', 'Unknown')}")
             except NoCredentialsError:
@@ -206,6 +840,10 @@ class BedrockService:
         print("\n🔧 AWS Configuration Debug:")
         print(f"   Region: {settings.AWS_REGION}")
         print(f"   Model: {settings.BEDROCK_MODEL_ID}")
+        print(f"   Endpoint: {settings.AWS_ENDPOINT_URL or 'AWS default'}")
+        print(f"   Pool: {', '.join(endpoint.name for endpoint in self.router.endpoints)}")
+        print(f"   Connections: {self.pool_size} per region, connect timeout "
+              f"{settings.BEDROCK_CONNECT_TIMEOUT_SECONDS}s, read timeout {settings.BEDROCK_READ_TIMEOUT_SECONDS}s")
 
         # Check for credentials in various locations
         try:
@@ -0,0 +1,176 @@
+import random
+import time
+from typing import List, Optional
+
+from app.config.settings import settings
+from app.services.rate_limiter import AdaptiveRateLimiter
+
+
+MODEL_FAMILIES = ("haiku", "sonnet", "opus")
+
+
+def model_family(model_id: str) -> str:
+    """Family name of a Claude model ID, e.g. haiku or sonnet"""
+    for family in MODEL_FAMILIES:
+        if family in model_id:
+            return family
+    return "other"
+
+
+class BedrockEndpoint:
+    """One region/model pair with its own rate limiter and health statistics"""
+
+    # Weight of the newest sample in the moving averages
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, region: str, model_id: str):
+        self.region = region
+        self.model_id = model_id
+        self.family = model_family(model_id)
+        self.rate_limiter = AdaptiveRateLimiter(
+            initial_rate=settings.BEDROCK_RATE_LIMIT_INITIAL,
+            min_rate=settings.BEDROCK_RATE_LIMIT_MIN,
+            max_rate=settings.BEDROCK_RATE_LIMIT_MAX,
+            burst=settings.BEDROCK_RATE_LIMIT_BURST,
+            increase_step=settings.BEDROCK_RATE_LIMIT_INCREASE,
+            decrease_factor=settings.BEDROCK_RATE_LIMIT_DECREASE
+        )
+
+        self.latency_ewma: Optional[float] = None
+        self.error_ewma = 0.0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.in_flight = 0
+
+        self.successes = 0
+        self.failures = 0
+        self.failovers = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.region}/{self.model_id}"
+
+    def is_cooling_down(self, now: float) -> bool:
+        return now < self.cooldown_until
+
+    def health_score(self) -> float:
+        """1.0 for an endpoint that never fails, approaching 0 as errors dominate"""
+        return max(0.05, 1.0 - self.error_ewma)
+
+    def weight(self, default_latency: float) -> float:
+        """Selection weight: healthy, fast, idle endpoints with rate budget are preferred"""
+        latency = self.latency_ewma if self.latency_ewma is not None else default_latency
+        weight = self.health_score() / max(latency, 0.01) / (1 + self.in_flight)
+        if self.rate_limiter.time_until_available() > 0:
+            weight *= 0.1
+        return weight
+
+    def record_success(self, latency: float) -> None:
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.error_ewma *= 1 - self.EWMA_ALPHA
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma += self.EWMA_ALPHA * (latency - self.latency_ewma)
+
+    def record_failure(self, error_code: str) -> None:
+        """Count a failure and take the endpoint out of rotation for a growing cooldown"""
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = error_code
+        self.error_ewma += self.EWMA_ALPHA * (1.0 - self.error_ewma)
+        cooldown = min(
+            settings.BEDROCK_ENDPOINT_MAX_COOLDOWN_SECONDS,
+            settings.BEDROCK_ENDPOINT_COOLDOWN_SECONDS * 2 ** (self.consecutive_failures - 1)
+        )
+        self.cooldown_until = time.monotonic() + cooldown
+
+    def get_stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "region": self.region,
+            "model_id": self.model_id,
+            "family": self.family,
+            "health_score": round(self.health_score(), 4),
+            "latency_ewma": round(self.latency_ewma, 4) if self.latency_ewma is not None else None,
+            "error_ewma": round(self.error_ewma, 4),
+            "in_flight": self.in_flight,
+            "cooling_down": self.is_cooling_down(now),
+            "cooldown_remaining": round(max(0.0, self.cooldown_until - now), 2),
+            "successes": self.successes,
+            "failures": self.failures,
+            "failovers": self.failovers,
+            "last_error": self.last_error,
+            "rate_limiter": self.rate_limiter.get_stats()
+        }
+
+
+class BedrockRouter:
+    """
+    Pool of Bedrock region/model endpoints
+
+    Endpoints are picked by weighted random choice over health score,
+    observed latency, in-flight calls and remaining rate budget. Endpoints
+    that just failed sit out a cooldown, unless every candidate is cooling
+    down, in which case the one that recovers first is used.
+    """
+
+    def __init__(self, endpoints: List[BedrockEndpoint]):
+        if not endpoints:
+            raise ValueError("At least one Bedrock endpoint is required")
+        self.endpoints = endpoints
+
+    @classmethod
+    def from_settings(cls) -> "BedrockRouter":
+        """
+        Build the pool from BEDROCK_ENDPOINTS, a comma separated list of
+        region=model_id pairs, defaulting to AWS_REGION=BEDROCK_MODEL_ID
+        """
+        endpoints = []
+        for entry in settings.BEDROCK_ENDPOINTS.split(","):
+            entry = entry.strip()
+            if not entry:
+                continue
+            region, separator, model_id = entry.partition("=")
+            if not separator or not region.strip() or not model_id.strip():
+                raise ValueError(f"Invalid BEDROCK_ENDPOINTS entry: {entry!r}, expected region=model_id")
+            endpoints.append(BedrockEndpoint(region.strip(), model_id.strip()))
+
+        if not endpoints:
+            endpoints.append(BedrockEndpoint(settings.AWS_REGION, settings.BEDROCK_MODEL_ID))
+        return cls(endpoints)
+
+    @property
+    def families(self) -> List[str]:
+        return sorted({endpoint.family for endpoint in self.endpoints})
+
+    def candidates(self, family: Optional[str] = None) -> List[BedrockEndpoint]:
+        """Endpoints serving the family, or all endpoints if no family is pinned"""
+        if family is None:
+            return list(self.endpoints)
+        return [endpoint for endpoint in self.endpoints if endpoint.family == family]
+
+    def select(self, family: Optional[str] = None, exclude=()) -> Optional[BedrockEndpoint]:
+        """Pick an endpoint, or None when every candidate is excluded"""
+        pool = [endpoint for endpoint in self.candidates(family) if endpoint not in exclude]
+        if not pool:
+            return None
+
+        now = time.monotonic()
+        available = [endpoint for endpoint in pool if not endpoint.is_cooling_down(now)]
+        if not available:
+            return min(pool, key=lambda endpoint: endpoint.cooldown_until)
+
+        observed = [e.latency_ewma for e in available if e.latency_ewma is not None]
+        default_latency = sum(observed) / len(observed) if observed else 1.0
+        weights = [endpoint.weight(default_latency) for endpoint in available]
+        return random.choices(available, weights=weights, k=1)[0]
+
+    def time_until_available(self, family: Optional[str] = None) -> float:
+        """Shortest wait before any candidate endpoint has rate budget again"""
+        return min(endpoint.rate_limiter.time_until_available() for endpoint in self.candidates(family))
+
+    def get_stats(self) -> List[dict]:
+        return [endpoint.get_stats() for endpoint in self.endpoints]
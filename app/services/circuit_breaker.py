@@ -0,0 +1,144 @@
+import time
+from collections import deque
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker with error-rate and slow-call thresholds
+
+    Closed, it records the outcome of the last window calls and opens once
+    at least min_calls are in and either the share of failures reaches
+    error_rate or the share of calls slower than slow_call_seconds reaches
+    slow_call_rate. Open, it rejects calls for open_seconds, then lets
+    half_open_calls trial calls through: all of them succeeding closes it,
+    any failing or slow one opens it again. Meant to be used from the
+    event loop only.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+            self,
+            window: int = 20,
+            min_calls: int = 10,
+            error_rate: float = 0.5,
+            slow_call_seconds: float = 20.0,
+            slow_call_rate: float = 0.8,
+            open_seconds: float = 30.0,
+            half_open_calls: int = 2,
+            enabled: bool = True
+    ):
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.enabled = enabled
+
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=window)  # (failed, slow) per call
+        self._opened_at = 0.0
+        self._trials = 0
+        self._trial_successes = 0
+
+        self.rejected = 0
+        self.times_opened = 0
+        self.last_opened_reason = None
+        self.state_changed_at = time.time()
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead; every allowed call must end in record_success, record_failure or release"""
+        if not self.enabled or self.state == self.CLOSED:
+            return True
+
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self._transition(self.HALF_OPEN)
+            self._trials = 0
+            self._trial_successes = 0
+
+        if self._trials >= self.half_open_calls:
+            self.rejected += 1
+            return False
+        self._trials += 1
+        return True
+
+    def retry_after(self) -> float:
+        """Seconds until calls may be let through again"""
+        if self.state == self.OPEN:
+            return max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+        return 1.0 if self.state == self.HALF_OPEN else 0.0
+
+    def record_success(self, latency: float) -> None:
+        self._record(failed=False, slow=latency >= self.slow_call_seconds)
+
+    def record_failure(self, latency: float) -> None:
+        self._record(failed=True, slow=latency >= self.slow_call_seconds)
+
+    def release(self) -> None:
+        """End an allowed call without an outcome, e.g. when it was cancelled"""
+        if self.state == self.HALF_OPEN and self._trials > 0:
+            self._trials -= 1
+
+    def _record(self, failed: bool, slow: bool) -> None:
+        if not self.enabled:
+            return
+
+        if self.state == self.HALF_OPEN:
+            if failed or slow:
+                self._open("trial call failed" if failed else "trial call was slow")
+                return
+            self._trial_successes += 1
+            if self._trial_successes >= self.half_open_calls:
+                self._outcomes.clear()
+                self._transition(self.CLOSED)
+            return
+
+        if self.state == self.OPEN:
+            # Call started before the breaker opened
+            return
+
+        self._outcomes.append((failed, slow))
+        if len(self._outcomes) < self.min_calls:
+            return
+        failures = sum(1 for call_failed, _ in self._outcomes if call_failed)
+        slow_calls = sum(1 for _, call_slow in self._outcomes if call_slow)
+        if failures / len(self._outcomes) >= self.error_rate:
+            self._open(f"{failures} of the last {len(self._outcomes)} calls failed")
+        elif slow_calls / len(self._outcomes) >= self.slow_call_rate:
+            self._open(f"{slow_calls} of the last {len(self._outcomes)} calls took over {self.slow_call_seconds}s")
+
+    def _open(self, reason: str) -> None:
+        self._opened_at = time.monotonic()
+        self.times_opened += 1
+        self.last_opened_reason = reason
+        self._transition(self.OPEN)
+        print(f"🔌 Circuit breaker opened: {reason}, failing fast for {self.open_seconds}s")
+
+    def _transition(self, state: str) -> None:
+        if state == self.CLOSED:
+            print("🔌 Circuit breaker closed")
+        self.state = state
+        self.state_changed_at = time.time()
+
+    def get_stats(self) -> dict:
+        """State and counters"""
+        outcomes = list(self._outcomes)
+        return {
+            "enabled": self.enabled,
+            "state": self.state,
+            "state_changed_at": self.state_changed_at,
+            "retry_after": round(self.retry_after(), 1),
+            "window_calls": len(outcomes),
+            "window_error_rate": round(sum(f for f, _ in outcomes) / len(outcomes), 3) if outcomes else 0.0,
+            "window_slow_rate": round(sum(s for _, s in outcomes) / len(outcomes), 3) if outcomes else 0.0,
+            "times_opened": self.times_opened,
+            "last_opened_reason": self.last_opened_reason,
+            "rejected": self.rejected
+        }
@@ -0,0 +1,90 @@
+import threading
+
+
+class ConnectionPoolMetrics:
+    """
+    Connection usage of the urllib3 pools behind one boto3 client
+
+    botocore creates its pools through the PoolManager of the client's HTTP
+    session; instrument() swaps the pool classes for subclasses that count
+    every connection checkout, return and newly opened connection. A
+    checkout while max_size connections are already in use gets a
+    connection that is thrown away on return, the sign of a pool too small
+    for the concurrency it serves.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.checkouts = 0
+        self.opened = 0
+        self.saturated_checkouts = 0
+        self.discarded = 0
+
+    def instrument(self, client) -> bool:
+        """Count the connections of a client created moments ago, False if botocore's internals differ"""
+        manager = getattr(getattr(client._endpoint, "http_session", None), "_manager", None)
+        if manager is None or manager.pools:
+            return False
+        manager.pool_classes_by_scheme = {
+            scheme: self._instrumented(pool_class)
+            for scheme, pool_class in manager.pool_classes_by_scheme.items()
+        }
+        return True
+
+    def _instrumented(self, pool_class: type) -> type:
+        metrics = self
+
+        class InstrumentedPool(pool_class):
+            def _get_conn(self, timeout=None):
+                metrics._checked_out()
+                try:
+                    return super()._get_conn(timeout)
+                except Exception:
+                    metrics._returned(discarded=False)
+                    raise
+
+            def _put_conn(self, conn):
+                metrics._returned(discarded=conn is not None and self.pool is not None and self.pool.full())
+                super()._put_conn(conn)
+
+            def _new_conn(self):
+                with metrics._lock:
+                    metrics.opened += 1
+                return super()._new_conn()
+
+        InstrumentedPool.__name__ = f"Instrumented{pool_class.__name__}"
+        return InstrumentedPool
+
+    def _checked_out(self) -> None:
+        with self._lock:
+            self.checkouts += 1
+            if self.in_use >= self.max_size:
+                self.saturated_checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def _returned(self, discarded: bool) -> None:
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+            if discarded:
+                self.discarded += 1
+
+    def get_stats(self) -> dict:
+        """Pool counters, reuse_ratio being the share of requests sent over a kept-alive connection"""
+        with self._lock:
+            reused = max(0, self.checkouts - self.opened)
+            return {
+                "max_size": self.max_size,
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "requests": self.checkouts,
+                "connections_opened": self.opened,
+                "reused": reused,
+                "reuse_ratio": round(reused / self.checkouts, 3) if self.checkouts else 0.0,
+                "saturated_requests": self.saturated_checkouts,
+                "discarded_connections": self.discarded
+            }
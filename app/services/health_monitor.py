@@ -0,0 +1,154 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import text
+
+from app.config.settings import settings
+from app.database.database import SessionLocal
+from app.services.bedrock import bedrock_service
+
+
+class HealthMonitor:
+    """
+    Background prober of credentials, Bedrock and database health
+
+    A task on the event loop runs every probe on a small executor of its
+    own each HEALTH_CHECK_INTERVAL_SECONDS and swaps in a new snapshot when
+    they are done, so slow probes never hold threads the request path uses. Health endpoints only read the last snapshot, so they never wait
+    on AWS, and the foundation model list is kept per region between probes.
+    """
+
+    def __init__(self, interval: float = 30.0, timeout: float = 10.0):
+        self.interval = interval
+        self.timeout = timeout
+        self._task: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.models: Dict[str, List[str]] = {}
+        self.probes = 0
+        self._snapshot = {
+            "status": "starting",
+            "checked_at": None,
+            "checks": {
+                name: {"status": "unknown", "latency": None, "error": None}
+                for name in ("credentials", "bedrock", "database")
+            },
+            "missing_models": []
+        }
+
+    async def start(self) -> None:
+        """Start probing in the background, the first probe runs right away"""
+        if self._task is None:
+            # One thread per probe
+            self._executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="health")
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"⚠️ Health probe failed: {type(e).__name__}: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def refresh(self) -> dict:
+        """Run every probe concurrently and publish a new snapshot"""
+        started = time.monotonic()
+        credentials, bedrock, database = await asyncio.gather(
+            self._check(self._probe_credentials),
+            self._check(self._probe_bedrock),
+            self._check(self._probe_database)
+        )
+
+        missing_models = bedrock.pop("missing_models", [])
+        checks = {"credentials": credentials, "bedrock": bedrock, "database": database}
+        healthy = all(check["status"] == "ok" for check in checks.values()) and not missing_models
+        previous = self._snapshot
+
+        self.probes += 1
+        self._snapshot = {
+            "status": "healthy" if healthy else "degraded",
+            "checked_at": datetime.utcnow().isoformat() + "Z",
+            "probe_duration": round(time.monotonic() - started, 4),
+            "checks": checks,
+            "missing_models": missing_models
+        }
+        self._report_transitions(previous["checks"], checks)
+        if missing_models and missing_models != previous["missing_models"]:
+            print(f"❌ Models not available: {', '.join(missing_models)}")
+        return self._snapshot
+
+    async def _check(self, probe: Callable[[], dict]) -> dict:
+        """Run a blocking probe with a timeout, turning failures into a failed check"""
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        try:
+            details = await asyncio.wait_for(loop.run_in_executor(self._executor, probe), self.timeout)
+            return {"status": "ok", "latency": round(time.monotonic() - started, 4), "error": None, **details}
+        except asyncio.TimeoutError:
+            error = f"Timed out after {self.timeout}s"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        return {"status": "failed", "latency": round(time.monotonic() - started, 4), "error": error}
+
+    def _probe_credentials(self) -> dict:
+        return bedrock_service.get_caller_identity()
+
+    def _probe_bedrock(self) -> dict:
+        """List models in every region of the endpoint pool and check the pool's models exist"""
+        endpoints = bedrock_service.router.endpoints
+        models = {}
+        for region in sorted({endpoint.region for endpoint in endpoints}):
+            models[region] = bedrock_service.list_model_ids(region)
+        self.models = models
+
+        return {
+            "model_counts": {region: len(model_ids) for region, model_ids in models.items()},
+            "missing_models": [
+                endpoint.name for endpoint in endpoints if endpoint.model_id not in models[endpoint.region]
+            ]
+        }
+
+    def _probe_database(self) -> dict:
+        db = SessionLocal()
+        try:
+            db.execute(text("SELECT 1"))
+            return {}
+        finally:
+            db.close()
+
+    @staticmethod
+    def _report_transitions(previous: dict, current: dict) -> None:
+        """Log a line whenever a check changes state"""
+        for name, check in current.items():
+            if previous[name]["status"] == check["status"]:
+                continue
+            if check["status"] == "ok":
+                print(f"✅ Health check {name}: OK")
+            else:
+                print(f"❌ Health check {name}: Failed - {check['error']}")
+
+    def get_snapshot(self) -> dict:
+        """Last published health snapshot, never blocks"""
+        snapshot = self._snapshot
+        return {**snapshot, "probes": self.probes, "interval": self.interval}
+
+
+# Global health monitor instance
+health_monitor = HealthMonitor(
+    interval=settings.HEALTH_CHECK_INTERVAL_SECONDS,
+    timeout=settings.HEALTH_CHECK_TIMEOUT_SECONDS
+)
@@ -0,0 +1,190 @@
+import io
+import math
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import HTTPException
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from app.config.settings import settings
+
+
+# Pillow format name -> media type accepted by Claude on Bedrock
+SUPPORTED_MEDIA_TYPES = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "GIF": "image/gif",
+    "WEBP": "image/webp",
+}
+
+# Magic numbers of the upload formats accepted by the API
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+)
+# Bytes needed to tell every supported format apart, WEBP being the longest
+SIGNATURE_LENGTH = 12
+
+
+def detect_image_type(header: bytes) -> Optional[str]:
+    """Media type from the magic number at the start of a file, or None if it is not a supported image"""
+    for signature, media_type in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return media_type
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+@dataclass
+class PreparedImage:
+    """Image bytes ready to be sent to Bedrock"""
+    data: bytes
+    media_type: str
+    width: int
+    height: int
+    original_format: str
+    original_size: int
+    reencoded: bool
+
+
+class ImagePreprocessor:
+    """
+    Normalises uploads before they are base64-encoded for Bedrock
+
+    Sniffs the real format from the bytes, applies EXIF orientation,
+    downsizes to the largest resolution the model makes use of and
+    re-encodes without metadata. The original bytes are kept when they are
+    already in a supported format, need no resizing, carry no metadata and
+    are smaller than the re-encoded version.
+    """
+
+    def __init__(
+            self,
+            enabled: bool = True,
+            max_dimension: int = 1568,
+            max_pixels: int = 1_150_000,
+            output_format: str = "JPEG",
+            quality: int = 85
+    ):
+        output_format = output_format.upper()
+        if output_format not in ("JPEG", "WEBP", "PNG"):
+            raise ValueError(f"Unsupported IMAGE_OUTPUT_FORMAT: {output_format}")
+
+        self.enabled = enabled
+        self.max_dimension = max_dimension
+        self.max_pixels = max_pixels
+        self.output_format = output_format
+        self.quality = quality
+
+    def target_size(self, width: int, height: int) -> tuple:
+        """Largest size within max_dimension and max_pixels, keeping aspect ratio"""
+        scale = min(
+            1.0,
+            self.max_dimension / max(width, height),
+            math.sqrt(self.max_pixels / (width * height))
+        )
+        return max(1, int(width * scale)), max(1, int(height * scale))
+
+    def prepare(self, image_data: bytes) -> PreparedImage:
+        """
+        Normalise raw image bytes
+
+        Raises:
+            HTTPException(400) if the bytes are not a readable image
+        """
+        try:
+            image = Image.open(io.BytesIO(image_data))
+            original_format = image.format or "UNKNOWN"
+            width, height = image.size
+        except (UnidentifiedImageError, OSError):
+            raise HTTPException(status_code=400, detail="Invalid image file: format not recognised")
+
+        if not self.enabled:
+            return PreparedImage(
+                data=image_data,
+                media_type=SUPPORTED_MEDIA_TYPES.get(original_format, "image/jpeg"),
+                width=width,
+                height=height,
+                original_format=original_format,
+                original_size=len(image_data),
+                reencoded=False
+            )
+
+        target_width, target_height = self.target_size(width, height)
+        needs_resize = (target_width, target_height) != (width, height)
+        has_metadata = any(key in image.info for key in ("exif", "icc_profile", "xmp", "comment"))
+
+        try:
+            if original_format == "JPEG" and needs_resize:
+                # Let libjpeg decode at a reduced scale instead of full resolution
+                image.draft("RGB", (target_width, target_height))
+
+            image = ImageOps.exif_transpose(image)
+            if needs_resize:
+                image.thumbnail(self.target_size(*image.size), Image.LANCZOS)
+
+            encoded = self._encode(image)
+        except OSError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid image file: {str(e)}")
+
+        if (original_format in SUPPORTED_MEDIA_TYPES and not needs_resize
+                and not has_metadata and len(image_data) <= len(encoded)):
+            return PreparedImage(
+                data=image_data,
+                media_type=SUPPORTED_MEDIA_TYPES[original_format],
+                width=width,
+                height=height,
+                original_format=original_format,
+                original_size=len(image_data),
+                reencoded=False
+            )
+
+        return PreparedImage(
+            data=encoded,
+            media_type=SUPPORTED_MEDIA_TYPES[self.output_format],
+            width=image.width,
+            height=image.height,
+            original_format=original_format,
+            original_size=len(image_data),
+            reencoded=True
+        )
+
+    def _encode(self, image: Image.Image) -> bytes:
+        """Encode in the output format, dropping all metadata"""
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+
+        if self.output_format == "JPEG":
+            if has_alpha:
+                # JPEG has no alpha channel, flatten onto white
+                rgba = image.convert("RGBA")
+                background = Image.new("RGB", rgba.size, (255, 255, 255))
+                background.paste(rgba, mask=rgba.getchannel("A"))
+                image = background
+            elif image.mode != "RGB":
+                image = image.convert("RGB")
+            options = {"quality": self.quality, "optimize": True}
+        elif self.output_format == "WEBP":
+            image = image.convert("RGBA" if has_alpha else "RGB")
+            options = {"quality": self.quality, "method": 4}
+        else:
+            if image.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+                image = image.convert("RGBA" if has_alpha else "RGB")
+            options = {"optimize": True}
+
+        buffer = io.BytesIO()
+        image.save(buffer, format=self.output_format, **options)
+        return buffer.getvalue()
+
+
+# Global preprocessor instance
+image_preprocessor = ImagePreprocessor(
+    enabled=settings.IMAGE_PREPROCESSING_ENABLED,
+    max_dimension=settings.IMAGE_MAX_DIMENSION,
+    max_pixels=settings.IMAGE_MAX_PIXELS,
+    output_format=settings.IMAGE_OUTPUT_FORMAT,
+    quality=settings.IMAGE_OUTPUT_QUALITY
+)
@@ -0,0 +1,378 @@
+import asyncio
+import uuid
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from fastapi import HTTPException
+from sqlalchemy.orm import undefer
+
+from app.config.settings import settings
+from app.database.database import SessionLocal
+from app.database.models import AnalysisJob
+from app.services.bedrock import bedrock_service
+from app.services.usage_meter import usage_meter
+
+
+FINISHED_STATUSES = {"succeeded", "failed", "cancelled"}
+# Failures worth another attempt once Bedrock's own retries gave up
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class _Subscribers:
+    """Event set when a job changes, and the number of coroutines waiting on it"""
+
+    def __init__(self):
+        self.event = asyncio.Event()
+        self.waiters = 0
+
+
+class AnalysisJobQueue:
+    """
+    Durable queue of image analysis jobs executed by an in-process worker pool
+
+    Jobs are rows of analysis_jobs, their IDs reach the workers through an
+    asyncio.Queue. A worker claims a job with a conditional UPDATE from
+    queued to running, so a job runs once even when several processes share
+    the database. Jobs left queued, or running past their lease, by a
+    stopped process are picked up again on start and by a periodic sweep,
+    which skips jobs this process already holds in its queue or has
+    scheduled for a retry.
+    """
+
+    # Seconds between sweeps for orphaned jobs
+    SWEEP_INTERVAL = 60.0
+
+    def __init__(
+            self,
+            workers: int = 2,
+            max_attempts: int = 3,
+            retry_delay: float = 5.0,
+            retention_hours: int = 24
+    ):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.retention_hours = retention_hours
+        # A running job whose worker has not finished it in this time is considered lost
+        self.lease_seconds = 2 * settings.BEDROCK_REQUEST_DEADLINE_SECONDS + 60
+
+        self._queue: Optional[asyncio.Queue] = None
+        # IDs in _queue or waiting out a retry delay, until a worker takes them
+        self._enqueued: Set[str] = set()
+        self._tasks: List[asyncio.Task] = []
+        self._subscribers: Dict[str, _Subscribers] = {}
+
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+        self.recovered = 0
+        self.cancelled = 0
+
+    async def start(self) -> None:
+        """Re-queue pending jobs and start the workers"""
+        if self._tasks:
+            return
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._enqueued = set()
+
+        pending = await loop.run_in_executor(None, self._recover, 0.0)
+        for job_id in pending:
+            self._enqueue(job_id)
+        if pending:
+            print(f"📥 Resuming {len(pending)} pending analysis job(s)")
+
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweeper()))
+
+    async def stop(self) -> None:
+        """Stop the workers, jobs they were running go back to the queue"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(
+            self,
+            image_data: bytes,
+            prompt: str,
+            filename: Optional[str] = None,
+            model_family: Optional[str] = None
+    ) -> AnalysisJob:
+        """Persist a job and hand it to the workers"""
+        if self._queue is None:
+            raise HTTPException(status_code=503, detail="Analysis job queue is not running")
+
+        loop = asyncio.get_running_loop()
+        job = await loop.run_in_executor(
+            None, self._insert, image_data, prompt, filename, model_family
+        )
+        self.submitted += 1
+        self._enqueue(job.id)
+        return job
+
+    async def cancel(self, job_id: str) -> bool:
+        """Cancel a job that has not started yet"""
+        loop = asyncio.get_running_loop()
+        cancelled = await loop.run_in_executor(None, self._cancel, job_id)
+        if cancelled:
+            self.cancelled += 1
+            self._notify(job_id)
+        return cancelled
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        """Load a job without its image; blocking, call off the event loop"""
+        db = SessionLocal()
+        try:
+            job = db.get(AnalysisJob, job_id)
+            if job is not None:
+                db.expunge(job)
+            return job
+        finally:
+            db.close()
+
+    async def wait_for_change(self, job_id: str, timeout: float) -> None:
+        """
+        Wait until a worker of this process updates the job, or the timeout passes
+
+        Jobs run by other processes are only seen on the next read, so
+        callers re-read the job after every wait regardless of the outcome.
+        """
+        subscribers = self._subscribers.get(job_id)
+        if subscribers is None:
+            subscribers = self._subscribers[job_id] = _Subscribers()
+
+        subscribers.waiters += 1
+        try:
+            await asyncio.wait_for(subscribers.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            subscribers.waiters -= 1
+            if subscribers.waiters == 0 and self._subscribers.get(job_id) is subscribers:
+                del self._subscribers[job_id]
+
+    def _enqueue(self, job_id: str, delay: float = 0.0) -> None:
+        """Hand a job to the workers, after delay seconds, unless it is already on its way"""
+        if job_id in self._enqueued:
+            return
+        self._enqueued.add(job_id)
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self._queue.put_nowait, job_id)
+        else:
+            self._queue.put_nowait(job_id)
+
+    def _notify(self, job_id: str) -> None:
+        subscribers = self._subscribers.pop(job_id, None)
+        if subscribers is not None:
+            subscribers.event.set()
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            self._enqueued.discard(job_id)
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Analysis job {job_id} crashed: {type(e).__name__}: {e}")
+
+    async def _run(self, job_id: str) -> None:
+        loop = asyncio.get_running_loop()
+        job = await loop.run_in_executor(None, self._claim, job_id)
+        if job is None:
+            # Cancelled, finished or claimed by another worker meanwhile
+            return
+        self._notify(job_id)
+
+        try:
+            result = await bedrock_service.analyze_image(job.image, job.prompt, job.model_family)
+        except asyncio.CancelledError:
+            # Shutting down, let the next start pick the job up again
+            await loop.run_in_executor(None, self._release, job_id, None, None)
+            raise
+        except HTTPException as e:
+            if e.status_code in RETRYABLE_STATUS_CODES and job.attempts < self.max_attempts:
+                delay = self.retry_delay * job.attempts
+                await loop.run_in_executor(
+                    None, self._release, job_id, str(e.detail), e.status_code, delay
+                )
+                self.retried += 1
+                self._enqueue(job_id, delay)
+            else:
+                await loop.run_in_executor(None, self._fail, job_id, str(e.detail), e.status_code)
+                self.failed += 1
+        except Exception as e:
+            await loop.run_in_executor(None, self._fail, job_id, f"Unexpected error: {str(e)}", 500)
+            self.failed += 1
+        else:
+            await loop.run_in_executor(
+                None, lambda: usage_meter.record(
+                    route="jobs",
+                    model_id=result.model_id,
+                    prompt=job.prompt,
+                    image_size=job.image_size,
+                    input_tokens=result.usage.input_tokens,
+                    output_tokens=result.usage.output_tokens,
+                    cached=result.cached
+                )
+            )
+            await loop.run_in_executor(None, self._succeed, job_id, asdict(result))
+            self.succeeded += 1
+
+        self._notify(job_id)
+
+    async def _sweeper(self) -> None:
+        """Pick up jobs orphaned by other processes and drop expired ones"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.SWEEP_INTERVAL)
+            try:
+                for job_id in await loop.run_in_executor(None, self._recover, self.SWEEP_INTERVAL):
+                    self._enqueue(job_id)
+            except Exception as e:
+                print(f"⚠️ Analysis job sweep failed: {type(e).__name__}: {e}")
+
+    def _insert(self, image_data: bytes, prompt: str, filename: Optional[str], model_family: Optional[str]) -> AnalysisJob:
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            job = AnalysisJob(
+                id=uuid.uuid4().hex,
+                status="queued",
+                filename=filename,
+                prompt=prompt,
+                model_family=model_family,
+                image=image_data,
+                image_size=len(image_data),
+                attempts=0,
+                created_at=now,
+                available_at=now
+            )
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+            db.expunge(job)
+            return job
+        finally:
+            db.close()
+
+    def _claim(self, job_id: str) -> Optional[AnalysisJob]:
+        """Move a queued job to running, returning it with its image, or None if it is not queued"""
+        db = SessionLocal()
+        try:
+            claimed = db.query(AnalysisJob) \
+                .filter(AnalysisJob.id == job_id, AnalysisJob.status == "queued") \
+                .update({
+                    AnalysisJob.status: "running",
+                    AnalysisJob.started_at: datetime.utcnow(),
+                    AnalysisJob.attempts: AnalysisJob.attempts + 1
+                }, synchronize_session=False)
+            db.commit()
+            if not claimed:
+                return None
+            job = db.query(AnalysisJob).options(undefer(AnalysisJob.image)).filter(AnalysisJob.id == job_id).one()
+            db.expunge(job)
+            return job
+        finally:
+            db.close()
+
+    def _update(self, job_id: str, **values) -> None:
+        db = SessionLocal()
+        try:
+            db.query(AnalysisJob).filter(AnalysisJob.id == job_id).update(values, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _release(self, job_id: str, error: Optional[str], status_code: Optional[int], delay: float = 0.0) -> None:
+        """Put a job back in the queue, not to be run for delay seconds"""
+        self._update(
+            job_id, status="queued", error=error, status_code=status_code,
+            available_at=datetime.utcnow() + timedelta(seconds=delay)
+        )
+
+    def _succeed(self, job_id: str, result: dict) -> None:
+        self._update(
+            job_id, status="succeeded", result=result, error=None, status_code=None,
+            image=None, finished_at=datetime.utcnow()
+        )
+
+    def _fail(self, job_id: str, error: str, status_code: int) -> None:
+        self._update(
+            job_id, status="failed", error=error, status_code=status_code,
+            image=None, finished_at=datetime.utcnow()
+        )
+
+    def _cancel(self, job_id: str) -> bool:
+        db = SessionLocal()
+        try:
+            cancelled = db.query(AnalysisJob) \
+                .filter(AnalysisJob.id == job_id, AnalysisJob.status == "queued") \
+                .update({
+                    AnalysisJob.status: "cancelled",
+                    AnalysisJob.image: None,
+                    AnalysisJob.finished_at: datetime.utcnow()
+                }, synchronize_session=False)
+            db.commit()
+            return bool(cancelled)
+        finally:
+            db.close()
+
+    def _recover(self, min_age: float) -> List[str]:
+        """
+        Re-queue running jobs past their lease, delete expired finished jobs
+        and return the IDs of queued jobs available for at least min_age seconds
+
+        The grace period leaves jobs that another process just submitted or
+        scheduled for a retry to that process.
+        """
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            recovered = db.query(AnalysisJob) \
+                .filter(AnalysisJob.status == "running",
+                        AnalysisJob.started_at < now - timedelta(seconds=self.lease_seconds)) \
+                .update({AnalysisJob.status: "queued"}, synchronize_session=False)
+
+            if self.retention_hours > 0:
+                db.query(AnalysisJob) \
+                    .filter(AnalysisJob.status.in_(FINISHED_STATUSES),
+                            AnalysisJob.finished_at < now - timedelta(hours=self.retention_hours)) \
+                    .delete(synchronize_session=False)
+            db.commit()
+            self.recovered += recovered
+
+            rows = db.query(AnalysisJob.id) \
+                .filter(AnalysisJob.status == "queued",
+                        AnalysisJob.available_at <= now - timedelta(seconds=min_age)) \
+                .order_by(AnalysisJob.available_at).all()
+            return [row.id for row in rows]
+        finally:
+            db.close()
+
+    def get_stats(self) -> dict:
+        """Worker pool counters"""
+        return {
+            "workers": self.workers,
+            "running": bool(self._tasks),
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+            "recovered": self.recovered,
+            "cancelled": self.cancelled
+        }
+
+
+# Global job queue instance
+job_queue = AnalysisJobQueue(
+    workers=settings.ANALYSIS_JOB_WORKERS,
+    max_attempts=settings.ANALYSIS_JOB_MAX_ATTEMPTS,
+    retry_delay=settings.ANALYSIS_JOB_RETRY_DELAY_SECONDS,
+    retention_hours=settings.ANALYSIS_JOB_RETENTION_HOURS
+)
@@ -0,0 +1,52 @@
+import binascii
+import json
+
+ANTHROPIC_VERSION = "bedrock-2023-05-31"
+
+# Input bytes encoded per step, a multiple of 3 so no chunk but the last is padded
+ENCODE_CHUNK_SIZE = 3 * 64 * 1024
+
+
+def base64_length(size: int) -> int:
+    """Length of the padded base64 encoding of size bytes"""
+    return 4 * ((size + 2) // 3)
+
+
+def build_image_request(image_data: bytes, media_type: str, prompt: str, max_tokens: int) -> bytearray:
+    """
+    Serialize a Claude 3 messages request for one image and a prompt
+
+    The JSON envelope and the base64 image are written into a single
+    buffer allocated at its final size, encoding the image in
+    ENCODE_CHUNK_SIZE steps. Unlike base64 + json.dumps this never holds the
+    encoded image as a separate bytes, str and JSON str, and botocore sends
+    the buffer as is instead of encoding a str body to UTF-8 once more.
+
+    Args:
+        image_data: Image bytes as they should be sent
+        media_type: Media type of image_data, e.g. image/jpeg
+        prompt: Analysis prompt
+        max_tokens: Maximum number of tokens to generate
+
+    Returns:
+        UTF-8 JSON request body
+    """
+    # json.dumps escapes non-ASCII characters, so both parts are plain ASCII;
+    # the base64 alphabet needs no escaping inside a JSON string
+    prefix = (
+        '{"anthropic_version": %s, "max_tokens": %d, "messages": [{"role": "user", "content": '
+        '[{"type": "image", "source": {"type": "base64", "media_type": %s, "data": "'
+        % (json.dumps(ANTHROPIC_VERSION), max_tokens, json.dumps(media_type))
+    ).encode("ascii")
+    suffix = ('"}}, {"type": "text", "text": %s}]}]}' % json.dumps(prompt)).encode("ascii")
+
+    body = bytearray(len(prefix) + base64_length(len(image_data)) + len(suffix))
+    with memoryview(body) as target, memoryview(image_data) as source:
+        target[:len(prefix)] = prefix
+        offset = len(prefix)
+        for start in range(0, len(source), ENCODE_CHUNK_SIZE):
+            encoded = binascii.b2a_base64(source[start:start + ENCODE_CHUNK_SIZE], newline=False)
+            target[offset:offset + len(encoded)] = encoded
+            offset += len(encoded)
+        target[offset:] = suffix
+    return body
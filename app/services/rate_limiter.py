@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket whose refill rate adapts to Bedrock throttling (AIMD)
+
+    Every successful call raises the rate additively by roughly
+    increase_step requests/second per second of traffic; every throttle
+    cuts it multiplicatively by decrease_factor, at most once per cooldown
+    so a single burst of throttles counts as one congestion signal.
+    Meant to be used from the event loop only.
+    """
+
+    def __init__(
+            self,
+            initial_rate: float = 5.0,
+            min_rate: float = 0.5,
+            max_rate: float = 50.0,
+            burst: int = 5,
+            increase_step: float = 0.5,
+            decrease_factor: float = 0.5,
+            decrease_cooldown: float = 1.0
+    ):
+        self.rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._last_decrease = 0.0
+
+        self.acquired = 0
+        self.rejected = 0
+        self.waited = 0
+        self.total_wait_time = 0.0
+        self.successes = 0
+        self.throttles = 0
+        self.decreases = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def time_until_available(self) -> float:
+        """Seconds until the next token is available"""
+        self._refill()
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    async def acquire(self, deadline: float) -> bool:
+        """
+        Wait for a token
+
+        Args:
+            deadline: time.monotonic() value after which to give up
+
+        Returns:
+            True if a token was taken, False if it could not be had before the deadline
+        """
+        started = time.monotonic()
+        waited = False
+        while True:
+            wait = self.time_until_available()
+            if wait == 0.0:
+                self._tokens -= 1
+                self.acquired += 1
+                if waited:
+                    self.waited += 1
+                    self.total_wait_time += time.monotonic() - started
+                return True
+
+            if time.monotonic() + wait > deadline:
+                self.rejected += 1
+                return False
+
+            waited = True
+            await asyncio.sleep(wait)
+
+    def on_success(self) -> None:
+        """Additive increase"""
+        self.successes += 1
+        self.rate = min(self.max_rate, self.rate + self.increase_step / max(self.rate, 1.0))
+
+    def on_throttle(self) -> None:
+        """Multiplicative decrease"""
+        self.throttles += 1
+        now = time.monotonic()
+        if now - self._last_decrease >= self.decrease_cooldown:
+            self._last_decrease = now
+            self.decreases += 1
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+
+    def get_stats(self) -> dict:
+        """Limiter state and counters"""
+        self._refill()
+        calls = self.successes + self.throttles
+        return {
+            "rate": round(self.rate, 3),
+            "min_rate": self.min_rate,
+            "max_rate": self.max_rate,
+            "tokens": round(self._tokens, 3),
+            "burst": self.burst,
+            "acquired": self.acquired,
+            "rejected": self.rejected,
+            "waited": self.waited,
+            "mean_wait_time": round(self.total_wait_time / self.waited, 4) if self.waited else 0.0,
+            "successes": self.successes,
+            "throttles": self.throttles,
+            "rate_decreases": self.decreases,
+            "throttle_rate": round(self.throttles / calls, 4) if calls else 0.0
+        }
@@ -0,0 +1,239 @@
+import hashlib
+import json
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.config.settings import settings
+from app.database.database import SessionLocal
+from app.database.models import BedrockUsageDaily
+
+
+# USD per 1,000 tokens, on-demand pricing
+DEFAULT_MODEL_PRICES = {
+    "anthropic.claude-3-haiku-20240307-v1:0": {"input": 0.00025, "output": 0.00125},
+    "anthropic.claude-3-sonnet-20240229-v1:0": {"input": 0.003, "output": 0.015},
+    "anthropic.claude-3-opus-20240229-v1:0": {"input": 0.015, "output": 0.075},
+}
+
+# Upper bounds in bytes and labels of the image size breakdown
+IMAGE_SIZE_BUCKETS = (
+    (100 * 1024, "<100KB"),
+    (512 * 1024, "100KB-512KB"),
+    (1024 * 1024, "512KB-1MB"),
+    (5 * 1024 * 1024, "1MB-5MB"),
+)
+
+PROMPT_PREVIEW_LENGTH = 80
+
+
+def image_size_bucket(size: int) -> str:
+    for limit, label in IMAGE_SIZE_BUCKETS:
+        if size < limit:
+            return label
+    return ">5MB"
+
+
+def load_model_prices() -> Dict[str, dict]:
+    """Built-in price table with BEDROCK_MODEL_PRICES applied on top"""
+    prices = {model_id: dict(price) for model_id, price in DEFAULT_MODEL_PRICES.items()}
+    if settings.BEDROCK_MODEL_PRICES:
+        try:
+            overrides = json.loads(settings.BEDROCK_MODEL_PRICES)
+        except ValueError as e:
+            raise ValueError(f"BEDROCK_MODEL_PRICES is not valid JSON: {e}")
+        for model_id, price in overrides.items():
+            prices[model_id] = {"input": float(price["input"]), "output": float(price["output"])}
+    return prices
+
+
+class UsageMeter:
+    """
+    Bedrock token usage and cost accounting
+
+    Every analysis adds its token counts and cost to a daily row keyed by
+    route, model, prompt and image size bucket in bedrock_usage_daily. Rows
+    are incremented in place with a single UPDATE, so concurrent workers can
+    share the table. Recording is blocking; call it off the event loop.
+    """
+
+    def __init__(self, enabled: bool = True, prices: Optional[Dict[str, dict]] = None):
+        self.enabled = enabled
+        self.prices = prices or {}
+        self._lock = threading.Lock()
+
+        self.recorded = 0
+        self.unpriced = 0
+        self.db_errors = 0
+
+    def cost(self, model_id: Optional[str], input_tokens: int, output_tokens: int) -> float:
+        """Cost in USD, 0.0 for models missing from the price table"""
+        price = self.prices.get(model_id or "")
+        if price is None:
+            return 0.0
+        return (input_tokens * price["input"] + output_tokens * price["output"]) / 1000
+
+    def record(
+            self,
+            route: str,
+            model_id: Optional[str],
+            prompt: str,
+            image_size: int,
+            input_tokens: int = 0,
+            output_tokens: int = 0,
+            cached: bool = False
+    ) -> None:
+        """Add one analysis to today's aggregates"""
+        if not self.enabled:
+            return
+
+        model_id = model_id or "unknown"
+        cost = self.cost(model_id, input_tokens, output_tokens)
+        key = {
+            "day": datetime.utcnow().date(),
+            "route": route,
+            "model_id": model_id,
+            "prompt_hash": hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16],
+            "image_size_bucket": image_size_bucket(image_size),
+        }
+        increments = {
+            BedrockUsageDaily.requests: BedrockUsageDaily.requests + 1,
+            BedrockUsageDaily.cached_requests: BedrockUsageDaily.cached_requests + (1 if cached else 0),
+            BedrockUsageDaily.input_tokens: BedrockUsageDaily.input_tokens + input_tokens,
+            BedrockUsageDaily.output_tokens: BedrockUsageDaily.output_tokens + output_tokens,
+            BedrockUsageDaily.cost: BedrockUsageDaily.cost + cost,
+        }
+
+        db = SessionLocal()
+        try:
+            for _ in range(2):
+                updated = db.query(BedrockUsageDaily).filter_by(**key).update(
+                    increments, synchronize_session=False
+                )
+                if updated:
+                    db.commit()
+                    break
+                db.add(BedrockUsageDaily(
+                    **key,
+                    prompt_preview=prompt[:PROMPT_PREVIEW_LENGTH],
+                    requests=1,
+                    cached_requests=1 if cached else 0,
+                    input_tokens=input_tokens,
+                    output_tokens=output_tokens,
+                    cost=cost
+                ))
+                try:
+                    db.commit()
+                    break
+                except IntegrityError:
+                    # Another worker created the row first, increment it instead
+                    db.rollback()
+
+            with self._lock:
+                self.recorded += 1
+                if model_id not in self.prices and not cached:
+                    self.unpriced += 1
+        except SQLAlchemyError as e:
+            db.rollback()
+            with self._lock:
+                self.db_errors += 1
+            print(f"⚠️ Usage metering failed: {e}")
+        finally:
+            db.close()
+
+    def get_report(self, db: Session, days: int = 30, route: Optional[str] = None, limit: int = 10) -> dict:
+        """
+        Usage over the last days, broken down by day, route, model, prompt and image size
+
+        Args:
+            db: Database session
+            days: Number of days to include, today counting as one
+            route: Only include this route
+            limit: Number of prompts in the top prompts list
+        """
+        since = datetime.utcnow().date() - timedelta(days=days - 1)
+        total_tokens = BedrockUsageDaily.input_tokens + BedrockUsageDaily.output_tokens
+        sums = (
+            func.sum(BedrockUsageDaily.requests).label("requests"),
+            func.sum(BedrockUsageDaily.cached_requests).label("cached_requests"),
+            func.sum(BedrockUsageDaily.input_tokens).label("input_tokens"),
+            func.sum(BedrockUsageDaily.output_tokens).label("output_tokens"),
+            func.sum(BedrockUsageDaily.cost).label("cost"),
+        )
+
+        def query(*columns):
+            q = db.query(*columns, *sums).filter(BedrockUsageDaily.day >= since)
+            if route:
+                q = q.filter(BedrockUsageDaily.route == route)
+            return q
+
+        def totals(row) -> dict:
+            requests = row.requests or 0
+            input_tokens = row.input_tokens or 0
+            output_tokens = row.output_tokens or 0
+            billed = requests - (row.cached_requests or 0)
+            return {
+                "requests": requests,
+                "cached_requests": row.cached_requests or 0,
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "cost": round(row.cost or 0.0, 6),
+                "avg_tokens_per_billed_request": (
+                    round((input_tokens + output_tokens) / billed, 1) if billed else 0.0
+                )
+            }
+
+        by_day = query(BedrockUsageDaily.day, BedrockUsageDaily.route) \
+            .group_by(BedrockUsageDaily.day, BedrockUsageDaily.route) \
+            .order_by(BedrockUsageDaily.day.desc(), BedrockUsageDaily.route).all()
+
+        by_model = query(BedrockUsageDaily.model_id) \
+            .group_by(BedrockUsageDaily.model_id) \
+            .order_by(func.sum(BedrockUsageDaily.cost).desc()).all()
+
+        by_prompt = query(BedrockUsageDaily.prompt_hash, func.min(BedrockUsageDaily.prompt_preview)) \
+            .group_by(BedrockUsageDaily.prompt_hash) \
+            .order_by(func.sum(total_tokens).desc()) \
+            .limit(limit).all()
+
+        by_image_size = query(BedrockUsageDaily.image_size_bucket) \
+            .group_by(BedrockUsageDaily.image_size_bucket).all()
+        bucket_order = [label for _, label in IMAGE_SIZE_BUCKETS] + [">5MB"]
+        by_image_size.sort(key=lambda row: bucket_order.index(row.image_size_bucket))
+
+        return {
+            "since": since.isoformat(),
+            "days": days,
+            "route": route,
+            "totals": totals(query().one()),
+            "by_day": [
+                {"day": row.day.isoformat(), "route": row.route, **totals(row)}
+                for row in by_day
+            ],
+            "by_model": [{"model_id": row.model_id, **totals(row)} for row in by_model],
+            "top_prompts_by_tokens": [
+                {"prompt_hash": row[0], "prompt_preview": row[1], **totals(row)}
+                for row in by_prompt
+            ],
+            "by_image_size": [{"image_size": row.image_size_bucket, **totals(row)} for row in by_image_size]
+        }
+
+    def get_stats(self) -> dict:
+        """Metering counters"""
+        return {
+            "enabled": self.enabled,
+            "recorded": self.recorded,
+            "unpriced": self.unpriced,
+            "db_errors": self.db_errors
+        }
+
+
+# Global usage meter instance
+usage_meter = UsageMeter(
+    enabled=settings.USAGE_METERING_ENABLED,
+    prices=load_model_prices()
+)
@@ -68,7 +68,7 @@ async function analyzeImage() {
             formData.append('prompt', prompt);
         }
 
-        const response = await fetch('/api/bedrock-demo/analyze', {
+        const response = await fetch('/api/bedrock-demo/analyze/stream', {
             method: 'POST',
             body: formData
         });
@@ -78,11 +78,25 @@ async function analyzeImage() {
             throw new Error(errorData.detail || `HTTP error! status: ${response.status}`);
         }
 
-        const result = await response.json();
+        // Render tokens as they arrive
+        resultContent.textContent = '';
+        let received = false;
 
-        // Display results
-        resultMeta.textContent = `Analysis completed at ${new Date().toLocaleString()}`;
-        resultContent.innerHTML = result.analysis || 'No analysis result returned.';
+        await readEventStream(response, (event, data) => {
+            if (event === 'token') {
+                received = true;
+                resultContent.textContent += data.text;
+            } else if (event === 'done') {
+                const source = data.cached ? ' (cached)' : '';
+                resultMeta.textContent = `Analysis completed at ${new Date().toLocaleString()}${source} · ` +
+                    `first token ${data.time_to_first_token.toFixed(2)}s · total ${data.total_time.toFixed(2)}s`;
+                if (!received) {
+                    resultContent.textContent = 'No analysis result returned.';
+                }
+            } else if (event === 'error') {
+                throw new Error(data.detail || 'Analysis failed');
+            }
+        });
 
     } catch (error) {
         console.error('Error analyzing image:', error);
@@ -92,4 +106,38 @@ async function analyzeImage() {
         analyzeButton.disabled = false;
         analyzeButton.innerHTML = '🚀 Analyze Image';
     }
+}
+
+// Parse a text/event-stream response body, calling onEvent(event, data) per frame
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            const dataLines = [];
+            for (const line of frame.split('\n')) {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    dataLines.push(line.slice(5).trim());
+                }
+            }
+            if (dataLines.length > 0) {
+                onEvent(event, JSON.parse(dataLines.join('\n')));
+            }
+        }
+    }
 }
\ No newline at end of file
@@ -0,0 +1,315 @@
+"""
+Offline Amazon Bedrock stand-in
+
+Serves the subset of AWS APIs the app uses, on a single port:
+  - bedrock-runtime InvokeModel                    POST /model/{modelId}/invoke
+  - bedrock-runtime InvokeModelWithResponseStream  POST /model/{modelId}/invoke-with-response-stream
+  - bedrock ListFoundationModels                   GET  /foundation-models
+  - sts GetCallerIdentity                          POST /
+
+Request signatures are not checked. Latency follows a lognormal
+distribution, throttling can be injected either as a fixed probability or
+by a requests/second quota, and a fraction of calls can fail with server
+errors. Settings can be changed at runtime through POST /_stub/config and
+counters are available at GET /_stub/stats.
+
+Point the app at it with:
+    AWS_ENDPOINT_URL=http://127.0.0.1:4010 AWS_ACCESS_KEY_ID=stub AWS_SECRET_ACCESS_KEY=stub python run.py
+
+Usage:
+    python tools/bedrock_stub.py --port 4010 --latency-median 2.0 --throttle-rate 0.05
+"""
+import argparse
+import asyncio
+import base64
+import json
+import math
+import random
+import struct
+import time
+import uuid
+import zlib
+from dataclasses import asdict, dataclass, fields
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+STUB_MODELS = [
+    ("anthropic.claude-3-haiku-20240307-v1:0", "Claude 3 Haiku"),
+    ("anthropic.claude-3-sonnet-20240229-v1:0", "Claude 3 Sonnet"),
+    ("anthropic.claude-3-opus-20240229-v1:0", "Claude 3 Opus"),
+]
+
+STUB_TEXT = (
+    "The image shows a product photographed against a plain background. "
+    "The subject is centred and evenly lit, with soft shadows on the right. "
+    "Colours are saturated and the composition is suitable for a catalogue listing."
+)
+
+
+@dataclass
+class StubConfig:
+    """Behaviour of the stub, adjustable at runtime"""
+    latency_median: float = 1.5  # seconds, full InvokeModel latency
+    latency_sigma: float = 0.4  # lognormal shape parameter
+    first_token_median: float = 0.4  # seconds until the first streamed chunk
+    token_interval: float = 0.03  # seconds between streamed chunks
+    throttle_rate: float = 0.0  # probability of a ThrottlingException
+    max_rps: float = 0.0  # requests/second quota, 0 disables
+    error_rate: float = 0.0  # probability of an InternalServerException
+    model_not_ready_rate: float = 0.0  # probability of a ModelNotReadyException
+    output_tokens: int = 120
+
+
+class StubState:
+    """Quota bucket and counters"""
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.tokens = config.max_rps
+        self.updated_at = time.monotonic()
+        self.counters = {}
+
+    def count(self, name: str):
+        self.counters[name] = self.counters.get(name, 0) + 1
+
+    def over_quota(self) -> bool:
+        if self.config.max_rps <= 0:
+            return False
+        now = time.monotonic()
+        self.tokens = min(self.config.max_rps, self.tokens + (now - self.updated_at) * self.config.max_rps)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return False
+        return True
+
+    def latency(self, median: float) -> float:
+        return random.lognormvariate(math.log(max(median, 1e-6)), self.config.latency_sigma)
+
+
+def aws_error(status_code: int, error_type: str, message: str) -> JSONResponse:
+    """rest-json error as botocore expects it"""
+    return JSONResponse(
+        status_code=status_code,
+        content={"message": message},
+        headers={"x-amzn-ErrorType": error_type, "x-amzn-RequestId": str(uuid.uuid4())}
+    )
+
+
+def encode_event(headers: dict, payload: bytes) -> bytes:
+    """Encode one application/vnd.amazon.eventstream message"""
+    encoded_headers = b""
+    for name, value in headers.items():
+        name_bytes = name.encode()
+        value_bytes = value.encode()
+        # Header value type 7 is a string
+        encoded_headers += struct.pack(">B", len(name_bytes)) + name_bytes
+        encoded_headers += struct.pack(">BH", 7, len(value_bytes)) + value_bytes
+
+    total_length = 12 + len(encoded_headers) + len(payload) + 4
+    prelude = struct.pack(">II", total_length, len(encoded_headers))
+    prelude += struct.pack(">I", zlib.crc32(prelude) & 0xFFFFFFFF)
+    message = prelude + encoded_headers + payload
+    return message + struct.pack(">I", zlib.crc32(message) & 0xFFFFFFFF)
+
+
+def chunk_event(body: dict) -> bytes:
+    """A PayloadPart event carrying one Anthropic streaming event"""
+    payload = json.dumps({"bytes": base64.b64encode(json.dumps(body).encode()).decode()}).encode()
+    return encode_event(
+        {":event-type": "chunk", ":content-type": "application/json", ":message-type": "event"},
+        payload
+    )
+
+
+def estimate_input_tokens(body: dict) -> int:
+    """Rough token count from payload sizes: ~400 base64 characters or 4 text characters a token"""
+    tokens = 0
+    for message in body.get("messages", []):
+        for part in message.get("content", []):
+            if part.get("type") == "image":
+                data_length = len(part.get("source", {}).get("data", ""))
+                tokens += min(1600, max(100, data_length // 400))
+            elif part.get("type") == "text":
+                tokens += max(1, len(part.get("text", "")) // 4)
+    return tokens
+
+
+def create_stub_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="Bedrock stub")
+    state = StubState(config)
+
+    async def inject_failure(model_id: str):
+        """Return an error response for injected failures, or None"""
+        if state.over_quota() or random.random() < config.throttle_rate:
+            state.count("throttled")
+            return aws_error(429, "ThrottlingException", "Too many requests, please wait before trying again.")
+        if random.random() < config.model_not_ready_rate:
+            state.count("model_not_ready")
+            return aws_error(429, "ModelNotReadyException", f"Model {model_id} is not ready.")
+        if random.random() < config.error_rate:
+            state.count("errors")
+            await asyncio.sleep(state.latency(config.latency_median) / 2)
+            return aws_error(500, "InternalServerException", "Injected internal server error.")
+        return None
+
+    async def parse_body(request: Request):
+        try:
+            return json.loads(await request.body())
+        except ValueError:
+            return None
+
+    @app.post("/model/{model_id}/invoke")
+    async def invoke_model(model_id: str, request: Request):
+        state.count("invoke_model")
+        body = await parse_body(request)
+        if body is None:
+            return aws_error(400, "ValidationException", "Malformed input request.")
+
+        failure = await inject_failure(model_id)
+        if failure is not None:
+            return failure
+
+        await asyncio.sleep(state.latency(config.latency_median))
+        input_tokens = estimate_input_tokens(body)
+        output_tokens = min(config.output_tokens, body.get("max_tokens", config.output_tokens))
+        return JSONResponse(
+            content={
+                "id": f"msg_{uuid.uuid4().hex}",
+                "type": "message",
+                "role": "assistant",
+                "model": model_id,
+                "content": [{"type": "text", "text": STUB_TEXT}],
+                "stop_reason": "end_turn",
+                "stop_sequence": None,
+                "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens}
+            },
+            headers={
+                "X-Amzn-Bedrock-Input-Token-Count": str(input_tokens),
+                "X-Amzn-Bedrock-Output-Token-Count": str(output_tokens),
+                "x-amzn-RequestId": str(uuid.uuid4())
+            }
+        )
+
+    @app.post("/model/{model_id}/invoke-with-response-stream")
+    async def invoke_model_stream(model_id: str, request: Request):
+        state.count("invoke_model_stream")
+        body = await parse_body(request)
+        if body is None:
+            return aws_error(400, "ValidationException", "Malformed input request.")
+
+        failure = await inject_failure(model_id)
+        if failure is not None:
+            return failure
+
+        input_tokens = estimate_input_tokens(body)
+        words = [word + " " for word in STUB_TEXT.split(" ")]
+
+        async def events():
+            start = time.monotonic()
+            await asyncio.sleep(state.latency(config.first_token_median))
+            yield chunk_event({
+                "type": "message_start",
+                "message": {"id": f"msg_{uuid.uuid4().hex}", "model": model_id,
+                            "usage": {"input_tokens": input_tokens, "output_tokens": 1}}
+            })
+            yield chunk_event({"type": "content_block_start", "index": 0,
+                               "content_block": {"type": "text", "text": ""}})
+            for word in words:
+                yield chunk_event({"type": "content_block_delta", "index": 0,
+                                   "delta": {"type": "text_delta", "text": word}})
+                await asyncio.sleep(config.token_interval)
+            yield chunk_event({"type": "content_block_stop", "index": 0})
+            yield chunk_event({"type": "message_delta", "delta": {"stop_reason": "end_turn"},
+                               "usage": {"output_tokens": len(words)}})
+            yield chunk_event({
+                "type": "message_stop",
+                "amazon-bedrock-invocationMetrics": {
+                    "inputTokenCount": input_tokens,
+                    "outputTokenCount": len(words),
+                    "invocationLatency": int((time.monotonic() - start) * 1000),
+                    "firstByteLatency": int(config.first_token_median * 1000)
+                }
+            })
+
+        return StreamingResponse(
+            events(),
+            media_type="application/vnd.amazon.eventstream",
+            headers={"X-Amzn-Bedrock-Content-Type": "application/json", "x-amzn-RequestId": str(uuid.uuid4())}
+        )
+
+    @app.get("/foundation-models")
+    async def list_foundation_models():
+        state.count("list_foundation_models")
+        return {
+            "modelSummaries": [
+                {
+                    "modelArn": f"arn:aws:bedrock:us-east-1::foundation-model/{model_id}",
+                    "modelId": model_id,
+                    "modelName": name,
+                    "providerName": "Anthropic",
+                    "inputModalities": ["TEXT", "IMAGE"],
+                    "outputModalities": ["TEXT"],
+                    "responseStreamingSupported": True,
+                    "customizationsSupported": [],
+                    "inferenceTypesSupported": ["ON_DEMAND"],
+                    "modelLifecycle": {"status": "ACTIVE"}
+                }
+                for model_id, name in STUB_MODELS
+            ]
+        }
+
+    @app.post("/")
+    async def sts(request: Request):
+        form = await request.form()
+        if form.get("Action") != "GetCallerIdentity":
+            return Response(status_code=400, content="Unsupported action")
+        state.count("get_caller_identity")
+        xml = (
+            '<GetCallerIdentityResponse xmlns="https://sts.amazonaws.com/doc/2011-06-15/">'
+            "<GetCallerIdentityResult>"
+            "<Arn>arn:aws:iam::000000000000:user/bedrock-stub</Arn>"
+            "<UserId>AIDASTUBSTUBSTUBSTUB</UserId>"
+            "<Account>000000000000</Account>"
+            "</GetCallerIdentityResult>"
+            f"<ResponseMetadata><RequestId>{uuid.uuid4()}</RequestId></ResponseMetadata>"
+            "</GetCallerIdentityResponse>"
+        )
+        return Response(content=xml, media_type="text/xml")
+
+    @app.get("/_stub/stats")
+    async def get_stats():
+        return {"config": asdict(config), "counters": state.counters}
+
+    @app.post("/_stub/config")
+    async def update_config(request: Request):
+        updates = await request.json()
+        known = {f.name for f in fields(StubConfig)}
+        for name, value in updates.items():
+            if name in known:
+                setattr(config, name, type(getattr(config, name))(value))
+        return asdict(config)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline Amazon Bedrock stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4010)
+    defaults = StubConfig()
+    for f in fields(StubConfig):
+        parser.add_argument(f"--{f.name.replace('_', '-')}", type=type(getattr(defaults, f.name)),
+                            default=getattr(defaults, f.name))
+    args = parser.parse_args()
+
+    config = StubConfig(**{f.name: getattr(args, f.name) for f in fields(StubConfig)})
+    print(f"🧪 Bedrock stub on http://{args.host}:{args.port}")
+    print(f"   {asdict(config)}")
+    uvicorn.run(create_stub_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark: bytes and latency saved by image preprocessing, per image class
+
+For every image class it reports the raw upload size, the size actually
+sent to Bedrock (base64 payload), the preprocessing time and the estimated
+upload time saved at a given uplink bandwidth. With --invoke it also times
+real analyze calls with preprocessing on and off (needs Bedrock access or
+the local stub).
+
+Usage:
+    python tools/image_benchmark.py
+    python tools/image_benchmark.py --images ~/catalogue --bandwidth-mbps 20
+    python tools/image_benchmark.py --invoke
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from app.config.settings import settings
+from app.services.image_preprocessing import ImagePreprocessor
+
+
+def synthetic_image(width: int, height: int, alpha: bool = False) -> Image.Image:
+    """Photo-like test image: gradient plus noise, so compression is realistic"""
+    gradient = Image.radial_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 40)
+    image = Image.merge("RGB", (gradient, noise, Image.linear_gradient("L").resize((width, height))))
+    if alpha:
+        image.putalpha(gradient)
+    return image
+
+
+def encode(image: Image.Image, fmt: str, **options) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **options)
+    return buffer.getvalue()
+
+
+def synthetic_classes() -> dict:
+    """Representative uploads keyed by class name"""
+    photo = synthetic_image(4032, 3024)
+    small = synthetic_image(800, 600)
+    return {
+        "phone-photo-jpeg": encode(photo, "JPEG", quality=95),
+        "phone-photo-png": encode(photo, "PNG"),
+        "phone-photo-bmp": encode(photo, "BMP"),
+        "phone-photo-webp": encode(photo, "WEBP", quality=90),
+        "product-cutout-png": encode(synthetic_image(2000, 2000, alpha=True), "PNG"),
+        "thumbnail-jpeg": encode(small, "JPEG", quality=80),
+    }
+
+
+def directory_classes(path: str) -> dict:
+    """Uploads read from a directory, keyed by file name"""
+    images = {}
+    for name in sorted(os.listdir(path)):
+        if os.path.splitext(name)[1].lower() in settings.ALLOWED_EXTENSIONS:
+            with open(os.path.join(path, name), "rb") as f:
+                images[name] = f.read()
+    return images
+
+
+def base64_size(size: int) -> int:
+    return 4 * ((size + 2) // 3)
+
+
+async def time_invocations(images: dict, repeats: int) -> dict:
+    """Mean analyze latency with preprocessing enabled and disabled"""
+    from app.services.bedrock import bedrock_service
+
+    bedrock_service.cache.enabled = False
+    timings = {}
+    for enabled in (False, True):
+        bedrock_service.preprocessor.enabled = enabled
+        for name, data in images.items():
+            samples = []
+            for _ in range(repeats):
+                try:
+                    result = await bedrock_service.analyze_image(data, "Describe this image in one sentence.")
+                    samples.append(result.processing_time)
+                except Exception as e:
+                    print(f"   {name} (preprocessing={'on' if enabled else 'off'}) failed: {e}")
+                    break
+            timings[(name, enabled)] = sum(samples) / len(samples) if samples else float("nan")
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Image preprocessing savings per image class")
+    parser.add_argument("--images", help="Directory of sample images (default: synthetic classes)")
+    parser.add_argument("--bandwidth-mbps", type=float, default=10.0, help="Uplink used to estimate upload time")
+    parser.add_argument("--invoke", action="store_true", help="Also time real analyze calls")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    images = directory_classes(args.images) if args.images else synthetic_classes()
+    preprocessor = ImagePreprocessor(
+        max_dimension=settings.IMAGE_MAX_DIMENSION,
+        max_pixels=settings.IMAGE_MAX_PIXELS,
+        output_format=settings.IMAGE_OUTPUT_FORMAT,
+        quality=settings.IMAGE_OUTPUT_QUALITY
+    )
+    bytes_per_second = args.bandwidth_mbps * 1_000_000 / 8
+
+    print(f"📊 Preprocessing to {settings.IMAGE_OUTPUT_FORMAT} q={settings.IMAGE_OUTPUT_QUALITY}, "
+          f"max {settings.IMAGE_MAX_DIMENSION}px / {settings.IMAGE_MAX_PIXELS} px, "
+          f"uplink {args.bandwidth_mbps} Mbps\n")
+    print(f"{'class':<22}{'raw b64':>12}{'sent b64':>12}{'saved':>8}{'prep ms':>10}{'upload saved ms':>17}")
+
+    for name, data in images.items():
+        start = time.perf_counter()
+        prepared = preprocessor.prepare(data)
+        prep_ms = (time.perf_counter() - start) * 1000
+
+        raw = base64_size(len(data))
+        sent = base64_size(len(prepared.data))
+        upload_saved_ms = (raw - sent) / bytes_per_second * 1000 - prep_ms
+        print(f"{name:<22}{raw:>12,}{sent:>12,}{(1 - sent / raw) * 100:>7.1f}%{prep_ms:>10.1f}{upload_saved_ms:>17.1f}")
+
+    if args.invoke:
+        timings = asyncio.run(time_invocations(images, args.repeats))
+        print(f"\n{'class':<22}{'raw s':>10}{'prepared s':>12}")
+        for name in images:
+            print(f"{name:<22}{timings[(name, False)]:>10.2f}{timings[(name, True)]:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+Load-test suite for the full FastAPI app
+
+Scenarios (closed loop: every client sends its next request as soon as the
+previous one finishes):
+  isolation  latency of a cheap endpoint, alone and with analyses in flight
+  analyze    POST /api/bedrock-demo/analyze
+  stream     POST /api/bedrock-demo/analyze/stream, reports time to first token
+  mixed      product and campaign reads interleaved with analyses
+  suite      all of the above
+
+Every scenario reports throughput and latency percentiles per request type.
+With --offline the Bedrock stub (tools/bedrock_stub.py) and the app are
+started as subprocesses on free ports with a throwaway database, so the
+suite runs without AWS access.
+
+Usage:
+    python tools/load_test.py suite --offline
+    python tools/load_test.py analyze --offline --concurrency 16 --stub-throttle-rate 0.1
+    python tools/load_test.py isolation --base-url http://127.0.0.1:8000 --image photo.jpg
+"""
+import argparse
+import io
+import json
+import mimetypes
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class Recorder:
+    """Thread-safe latency and status collector, keyed by request name"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Dict[int, int]] = {}
+        self.extra: Dict[str, List[float]] = {}
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    def record(self, name: str, latency: float, status: int):
+        with self._lock:
+            self.statuses.setdefault(name, {})
+            self.statuses[name][status] = self.statuses[name].get(status, 0) + 1
+            if 200 <= status < 300:
+                self.latencies.setdefault(name, []).append(latency)
+
+    def record_extra(self, name: str, value: float):
+        with self._lock:
+            self.extra.setdefault(name, []).append(value)
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    def report(self, title: str):
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        print(f"\n📊 {title} ({elapsed:.1f}s)")
+        print(f"   {'request':<18}{'ok':>7}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}  statuses")
+        for name in sorted(self.statuses):
+            samples = self.latencies.get(name, [])
+            print(
+                f"   {name:<18}{len(samples):>7}{len(samples) / elapsed:>8.1f}"
+                f"{percentile(samples, 50) * 1000:>9.1f}{percentile(samples, 95) * 1000:>9.1f}"
+                f"{percentile(samples, 99) * 1000:>9.1f}{(max(samples) if samples else 0) * 1000:>9.1f}"
+                f"  {dict(sorted(self.statuses[name].items()))}"
+            )
+        for name, values in sorted(self.extra.items()):
+            print(
+                f"   {name:<18}{len(values):>7}{'':>8}{percentile(values, 50) * 1000:>9.1f}"
+                f"{percentile(values, 95) * 1000:>9.1f}{percentile(values, 99) * 1000:>9.1f}"
+                f"{max(values) * 1000:>9.1f}"
+            )
+
+
+def synthetic_jpeg(width: int = 1600, height: int = 1200) -> bytes:
+    """Noisy photo-sized JPEG, so preprocessing does realistic work"""
+    from PIL import Image
+
+    image = Image.merge("RGB", [Image.effect_noise((width, height), 30 + 10 * i) for i in range(3)])
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def encode_multipart(fields: dict, filename: str, file_bytes: bytes) -> tuple:
+    """Build a multipart/form-data body with one file"""
+    boundary = uuid.uuid4().hex
+    content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    parts.append(
+        (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; '
+         f'filename="{filename}"\r\nContent-Type: {content_type}\r\n\r\n').encode()
+        + file_bytes + b"\r\n"
+    )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class Client:
+    """Request helpers against one base URL"""
+
+    def __init__(self, base_url: str, image: bytes, image_name: str, unique_prompts: bool):
+        self.base_url = base_url.rstrip("/")
+        self.image = image
+        self.image_name = image_name
+        self.unique_prompts = unique_prompts
+
+    def _send(self, request: urllib.request.Request, on_first_byte: Optional[Callable[[float], None]] = None) -> tuple:
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=180) as response:
+                if on_first_byte is not None:
+                    first = response.read(1)
+                    if first:
+                        on_first_byte(time.perf_counter() - start)
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            status = e.code
+        except Exception:
+            status = 0
+        return time.perf_counter() - start, status
+
+    def get(self, path: str) -> tuple:
+        return self._send(urllib.request.Request(self.base_url + path))
+
+    def _analysis_request(self, path: str) -> urllib.request.Request:
+        fields = {}
+        if self.unique_prompts:
+            # Defeat the analysis cache and request coalescing
+            fields["prompt"] = f"Describe this image. Request {uuid.uuid4().hex[:8]}."
+        body, content_type = encode_multipart(fields, self.image_name, self.image)
+        return urllib.request.Request(
+            self.base_url + path, data=body, headers={"Content-Type": content_type}, method="POST"
+        )
+
+    def analyze(self) -> tuple:
+        return self._send(self._analysis_request("/api/bedrock-demo/analyze"))
+
+    def analyze_stream(self, on_first_byte: Callable[[float], None]) -> tuple:
+        return self._send(self._analysis_request("/api/bedrock-demo/analyze/stream"), on_first_byte)
+
+
+def closed_loop(workers: Dict[str, int], actions: Dict[str, Callable[[], tuple]], duration: float,
+                recorder: Recorder):
+    """Run each action with the given number of concurrent clients for duration seconds"""
+    deadline = time.perf_counter() + duration
+
+    def loop(name: str):
+        while time.perf_counter() < deadline:
+            latency, status = actions[name]()
+            recorder.record(name, latency, status)
+
+    total = sum(workers.values())
+    with ThreadPoolExecutor(max_workers=max(total, 1)) as pool:
+        for name, count in workers.items():
+            for _ in range(count):
+                pool.submit(loop, name)
+    recorder.stop()
+
+
+def scenario_isolation(client: Client, args):
+    """Probe endpoint latency, alone and while analyses are in flight"""
+    probe = lambda: client.get(args.probe_path)
+
+    baseline = Recorder()
+    closed_loop({"probe": 1}, {"probe": probe}, args.duration, baseline)
+    baseline.report(f"isolation: {args.probe_path} alone")
+
+    loaded = Recorder()
+    closed_loop(
+        {"probe": 1, "analyze": args.concurrency},
+        {"probe": probe, "analyze": client.analyze},
+        args.duration,
+        loaded
+    )
+    loaded.report(f"isolation: {args.probe_path} with {args.concurrency} analyses in flight")
+
+
+def scenario_analyze(client: Client, args):
+    recorder = Recorder()
+    closed_loop({"analyze": args.concurrency}, {"analyze": client.analyze}, args.duration, recorder)
+    recorder.report(f"analyze: {args.concurrency} clients")
+
+
+def scenario_stream(client: Client, args):
+    recorder = Recorder()
+    stream = lambda: client.analyze_stream(lambda ttfb: recorder.record_extra("first byte", ttfb))
+    closed_loop({"stream": args.concurrency}, {"stream": stream}, args.duration, recorder)
+    recorder.report(f"stream: {args.concurrency} clients")
+
+
+def scenario_mixed(client: Client, args):
+    reads = max(1, args.concurrency * 3 // 4)
+    recorder = Recorder()
+    closed_loop(
+        {"products": reads // 2 or 1, "campaigns": reads - reads // 2 or 1,
+         "analyze": max(1, args.concurrency - reads)},
+        {
+            "products": lambda: client.get(f"/api/products/{random.randint(1, 15)}"),
+            "campaigns": lambda: client.get("/api/campaigns/"),
+            "analyze": client.analyze,
+        },
+        args.duration,
+        recorder
+    )
+    recorder.report(f"mixed: {args.concurrency} clients")
+
+
+SCENARIOS = {
+    "isolation": scenario_isolation,
+    "analyze": scenario_analyze,
+    "stream": scenario_stream,
+    "mixed": scenario_mixed,
+}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url: str, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=2):
+                return
+        except Exception:
+            time.sleep(0.25)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+@contextmanager
+def offline_stack(args):
+    """Start the Bedrock stub and the app against it, yield the app base URL"""
+    stub_port, app_port = free_port(), free_port()
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    processes = []
+    try:
+        stub_args = [
+            sys.executable, os.path.join(REPO_ROOT, "tools", "bedrock_stub.py"), "--port", str(stub_port),
+            "--latency-median", str(args.stub_latency), "--throttle-rate", str(args.stub_throttle_rate),
+            "--error-rate", str(args.stub_error_rate), "--max-rps", str(args.stub_max_rps),
+        ]
+        processes.append(subprocess.Popen(stub_args, cwd=REPO_ROOT))
+        wait_until_up(f"http://127.0.0.1:{stub_port}/_stub/stats")
+
+        env = dict(
+            os.environ,
+            AWS_ENDPOINT_URL=f"http://127.0.0.1:{stub_port}",
+            AWS_ACCESS_KEY_ID="stub",
+            AWS_SECRET_ACCESS_KEY="stub",
+            DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'app.db')}",
+        )
+        app_args = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(app_port),
+                    "--log-level", "warning"]
+        processes.append(subprocess.Popen(app_args, cwd=REPO_ROOT, env=env))
+        wait_until_up(f"http://127.0.0.1:{app_port}/web/config")
+
+        yield f"http://127.0.0.1:{app_port}"
+        with urllib.request.urlopen(f"http://127.0.0.1:{stub_port}/_stub/stats") as response:
+            print(f"\n🧪 Stub counters: {json.loads(response.read())['counters']}")
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test suite for the FastAPI app")
+    parser.add_argument("scenario", choices=list(SCENARIOS) + ["suite"])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--offline", action="store_true", help="Start the Bedrock stub and the app locally")
+    parser.add_argument("--image", help="Image file to analyze (default: synthetic 1600x1200 JPEG)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per scenario phase")
+    parser.add_argument("--probe-path", default="/api/products/")
+    parser.add_argument("--unique-prompts", action="store_true", help="Bypass cache and coalescing")
+    parser.add_argument("--stub-latency", type=float, default=1.5)
+    parser.add_argument("--stub-throttle-rate", type=float, default=0.0)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--stub-max-rps", type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.image:
+        with open(args.image, "rb") as f:
+            image, image_name = f.read(), os.path.basename(args.image)
+    else:
+        image, image_name = synthetic_jpeg(), "synthetic.jpg"
+
+    scenarios = list(SCENARIOS) if args.scenario == "suite" else [args.scenario]
+
+    def run(base_url: str):
+        client = Client(base_url, image, image_name, args.unique_prompts)
+        for name in scenarios:
+            SCENARIOS[name](client, args)
+
+    if args.offline:
+        with offline_stack(args) as base_url:
+            run(base_url)
+    else:
+        run(args.base_url)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Benchmark: peak memory of building Bedrock request payloads
+
+Builds the request body for an image of --size-mb MB from --concurrency
+threads at once, keeping every body alive until all are built, the way
+concurrent analyses overlap on the service executor. Each measurement runs
+in a fresh interpreter and reports the growth of peak RSS over the
+interpreter's baseline with the image already loaded.
+
+Two builders are compared:
+  - json:   base64.b64encode + .decode + nested dict + json.dumps, plus the
+            UTF-8 encode botocore applies to a str body (the previous code)
+  - buffer: app.services.payload_builder.build_image_request
+
+Preprocessing is left out: the image is random bytes standing in for an
+already prepared, incompressible JPEG.
+
+Usage:
+    python tools/payload_benchmark.py
+    python tools/payload_benchmark.py --size-mb 5 --concurrency 1 4 8
+"""
+import argparse
+import base64
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.payload_builder import build_image_request
+
+PROMPT = "Analyze this image and describe what you see in detail."
+MAX_TOKENS = 1000
+
+
+def build_json(image_data: bytes) -> bytes:
+    """Previous payload construction, including botocore's encode of the str body"""
+    image_base64 = base64.b64encode(image_data).decode('utf-8')
+    request_body = {
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": MAX_TOKENS,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "image", "source": {"type": "base64", "media_type": "image/jpeg", "data": image_base64}},
+                    {"type": "text", "text": PROMPT}
+                ]
+            }
+        ]
+    }
+    return json.dumps(request_body).encode('utf-8')
+
+
+def build_buffer(image_data: bytes) -> bytearray:
+    return build_image_request(image_data, "image/jpeg", PROMPT, MAX_TOKENS)
+
+
+BUILDERS = {"json": build_json, "buffer": build_buffer}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def run_child(builder: str, size_mb: float, concurrency: int) -> dict:
+    """One measurement, run in a fresh interpreter"""
+    build = BUILDERS[builder]
+    image_data = os.urandom(int(size_mb * 1024 * 1024))
+    # Warm up imports and allocator pools on a small image
+    build(os.urandom(1024))
+    baseline = peak_rss_mb()
+
+    barrier = threading.Barrier(concurrency)
+    bodies = [None] * concurrency
+    durations = [0.0] * concurrency
+
+    def worker(index: int):
+        started = time.perf_counter()
+        bodies[index] = build(image_data)
+        durations[index] = time.perf_counter() - started
+        # Hold the body until every worker has built one
+        barrier.wait()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    growth = peak_rss_mb() - baseline
+    return {
+        "builder": builder,
+        "concurrency": concurrency,
+        "body_mb": len(bodies[0]) / (1024 * 1024),
+        "peak_growth_mb": growth,
+        "per_request_mb": growth / concurrency,
+        "build_ms": 1000 * sum(durations) / concurrency
+    }
+
+
+def measure(builder: str, size_mb: float, concurrency: int) -> dict:
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", builder,
+         "--size-mb", str(size_mb), "--concurrency", str(concurrency)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak memory of Bedrock request payload construction")
+    parser.add_argument("--size-mb", type=float, default=5.0, help="Image size in MB")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8],
+                        help="Concurrent analyses to simulate")
+    parser.add_argument("--child", choices=BUILDERS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.size_mb, args.concurrency[0])))
+        return
+
+    # Both builders must produce the same request
+    sample = os.urandom(4096)
+    assert json.loads(build_json(sample)) == json.loads(build_buffer(sample))
+
+    print(f"📦 Payload peak RSS for a {args.size_mb:g} MB image")
+    print(f"{'builder':<8} {'concurrency':>11} {'body MB':>8} {'peak +MB':>9} {'MB/request':>11} "
+          f"{'x image':>8} {'build ms':>9}")
+    for concurrency in args.concurrency:
+        for builder in BUILDERS:
+            result = measure(builder, args.size_mb, concurrency)
+            print(f"{builder:<8} {concurrency:>11} {result['body_mb']:>8.2f} {result['peak_growth_mb']:>9.1f} "
+                  f"{result['per_request_mb']:>11.2f} {result['per_request_mb'] / args.size_mb:>8.2f} "
+                  f"{result['build_ms']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()